@@ -0,0 +1,199 @@
+import os
+import sys
+import argparse
+from collections import defaultdict
+
+from ffmpeg_runner import load_records
+from media_probe import probe_command, parse_probe
+from ffmpeg_async import FFmpegSupervisor
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm")
+
+# Tool -> (recorded operation, recorded encoder) whose history predicts its cost
+TOOLS = {
+    "crop": ("crop", "h264_nvenc,copy"),
+    "resize": ("resize", "opencv-xvid"),
+    "pad-text": ("pad-text", "libx264,aac"),
+    "extract-audio": ("extract-audio", None),
+    "strip-metadata": ("strip-metadata", "copy"),
+    "pipeline": ("pipeline", None),
+}
+
+# Operations whose cost follows the bytes moved rather than the pixels decoded
+BYTE_OPERATIONS = ("strip-metadata", "stream-copy", "split", "concat")
+# Operations whose cost follows the media duration only
+DURATION_OPERATIONS = ("extract-audio",)
+
+
+def work_units(operation, input_bytes, media_s=None, width=None, height=None):
+    """
+    Size of one job in the unit the operation's cost scales with:
+    bytes for stream copies, seconds for audio, megapixel-seconds for video.
+    Returns:
+        float: Units, or None if the needed inputs are missing
+    """
+    if operation in BYTE_OPERATIONS:
+        return input_bytes or None
+    if not media_s:
+        return None
+    if operation in DURATION_OPERATIONS:
+        return media_s
+    if not width or not height:
+        return None
+    return media_s * width * height / 1e6
+
+
+def fit(records):
+    """
+    Learn per-unit wall time, CPU time and output bytes from successful past runs.
+    Rates are kept per (operation, encoder) and per (operation, None) across encoders.
+    Returns:
+        dict: (operation, encoder) -> {"jobs", "units", "wall_s", "cpu_s", "output_bytes"}
+    """
+    totals = defaultdict(lambda: {"jobs": 0, "units": 0.0, "wall_s": 0.0, "cpu_s": 0.0, "output_bytes": 0})
+    for r in records:
+        if r.get("returncode") != 0 or not r.get("wall_s"):
+            continue
+        units = work_units(r["operation"], r.get("input_bytes"), r.get("media_s"), r.get("width"), r.get("height"))
+        if not units:
+            continue
+        for key in {(r["operation"], r.get("encoder")), (r["operation"], None)}:
+            entry = totals[key]
+            entry["jobs"] += 1
+            entry["units"] += units
+            entry["wall_s"] += r["wall_s"]
+            entry["cpu_s"] += (r.get("cpu_user_s") or 0) + (r.get("cpu_sys_s") or 0)
+            entry["output_bytes"] += r.get("output_bytes") or 0
+    return dict(totals)
+
+
+def estimate(model, operation, encoder, input_bytes, info):
+    """
+    Predict one job from its probe data.
+    Args:
+        model: Output of fit()
+        operation: Recorded operation name
+        encoder: Recorded encoder, falls back to all encoders of the operation
+        input_bytes: Input file size
+        info: parse_probe() result or None
+    Returns:
+        dict: {"wall_s", "cpu_s", "output_bytes"} or None without usable history
+    """
+    entry = model.get((operation, encoder)) or model.get((operation, None))
+    info = info or {}
+    units = work_units(operation, input_bytes, info.get("duration"), info.get("width"), info.get("height"))
+    if not entry or not units:
+        return None
+    scale = units / entry["units"]
+    return {key: entry[key] * scale for key in ("wall_s", "cpu_s", "output_bytes")}
+
+
+def probe_all(paths, concurrency=None):
+    """Probe many files as concurrent ffprobe children. Returns {path: info or None}."""
+    jobs = [{"cmd": probe_command(path), "input": path, "operation": "probe"} for path in paths]
+    results = FFmpegSupervisor(concurrency=concurrency).run_batch(jobs)
+    return {
+        result["job"]["input"]: parse_probe(result["stdout"]) if result["status"] == "done" else None
+        for result in results
+    }
+
+
+def plan(tool, paths, workers=None, encoder=None, records=None):
+    """
+    Dry run: predict a batch's wall time, CPU-hours and output size without encoding.
+    Cache hits and duplicate inputs are not subtracted, so this is an upper bound.
+    Args:
+        tool: Key of TOOLS, e.g. "crop"
+        paths: Input videos
+        workers: Concurrent jobs the batch will run, defaults to the CPU count
+        encoder: Override the recorded encoder to model
+        records: Metrics records to learn from, defaults to the whole history
+    Returns:
+        dict: Plan summary, see format_plan()
+    """
+    operation, default_encoder = TOOLS[tool]
+    encoder = encoder or default_encoder
+    workers = workers or os.cpu_count() or 1
+    model = fit(load_records() if records is None else records)
+    probes = probe_all(paths) if operation not in BYTE_OPERATIONS else {}
+
+    summary = {
+        "tool": tool, "files": len(paths), "workers": workers, "encoder": encoder,
+        "history_jobs": (model.get((operation, encoder)) or model.get((operation, None)) or {}).get("jobs", 0),
+        "input_bytes": 0, "media_s": 0.0, "job_wall_s": 0.0, "cpu_s": 0.0, "output_bytes": 0.0,
+        "unprobed": 0, "unestimated": 0,
+    }
+    for path in paths:
+        size = os.path.getsize(path)
+        info = probes.get(path)
+        if operation not in BYTE_OPERATIONS and info is None:
+            summary["unprobed"] += 1
+        summary["input_bytes"] += size
+        summary["media_s"] += (info or {}).get("duration") or 0
+        job = estimate(model, operation, encoder, size, info)
+        if job is None:
+            summary["unestimated"] += 1
+            continue
+        summary["job_wall_s"] += job["wall_s"]
+        summary["cpu_s"] += job["cpu_s"]
+        summary["output_bytes"] += job["output_bytes"]
+    summary["wall_s"] = summary["job_wall_s"] / workers
+    return summary
+
+
+def _duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds // 60:.0f}m {seconds % 60:02.0f}s"
+    return f"{seconds // 3600:.0f}h {seconds % 3600 // 60:02.0f}m"
+
+
+def format_plan(summary):
+    """Human-readable lines for a plan() summary."""
+    lines = [
+        f"[PLAN] {summary['tool']}: {summary['files']} files, {_duration(summary['media_s'])} of media, "
+        f"{summary['input_bytes'] / 1e9:.2f} GB in",
+    ]
+    if not summary["history_jobs"]:
+        lines.append(f"[PLAN] No successful {summary['tool']} runs recorded yet; run a small batch first.")
+        return lines
+    lines += [
+        f"[PLAN] Model: {summary['history_jobs']} past runs ({summary['encoder'] or 'any encoder'})",
+        f"[PLAN] Predicted wall time {_duration(summary['wall_s'])} with {summary['workers']} workers, "
+        f"{summary['cpu_s'] / 3600:.2f} CPU-hours, output ~{summary['output_bytes'] / 1e9:.2f} GB",
+    ]
+    if summary["unprobed"] or summary["unestimated"]:
+        lines.append(
+            f"[PLAN] Not included: {summary['unestimated']} files "
+            f"({summary['unprobed']} could not be probed)"
+        )
+    return lines
+
+
+def list_inputs(folder):
+    """Video files directly inside folder, sorted."""
+    return sorted(
+        os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(VIDEO_EXTENSIONS)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Predict the cost of a batch from past runs, without encoding.")
+    parser.add_argument("tool", choices=sorted(TOOLS))
+    parser.add_argument("folder", help="Folder with the input videos")
+    parser.add_argument("--workers", type=int, help="Concurrent jobs, defaults to the CPU count")
+    parser.add_argument("--encoder", help="Recorded encoder to model, e.g. libx264,aac")
+    args = parser.parse_args(argv)
+
+    paths = list_inputs(args.folder)
+    if not paths:
+        print(f"No video files found in {args.folder}")
+        return 1
+    for line in format_plan(plan(args.tool, paths, workers=args.workers, encoder=args.encoder)):
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import os
+import hashlib
+from collections import defaultdict
+
+from fast_paths import link_or_copy
+
+BLOCK_SIZE = 1024 * 1024  # Bytes hashed from each end of a file in the cheap pass
+
+
+def partial_hash(path, block_size=BLOCK_SIZE):
+    """
+    Hash the size plus the first and last block of a file (two reads, any file size).
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode("ascii"), digest_size=20)
+    with open(path, "rb") as file:
+        digest.update(file.read(block_size))
+        if size > block_size:
+            file.seek(max(block_size, size - block_size))
+            digest.update(file.read(block_size))
+    return digest.hexdigest()
+
+
+def full_hash(path, chunk_size=4 * 1024 * 1024):
+    """Hash the whole file in chunks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _split(paths, key):
+    groups = defaultdict(list)
+    for path in paths:
+        groups[key(path)].append(path)
+    return groups.values()
+
+
+def find_duplicates(paths, block_size=BLOCK_SIZE):
+    """
+    Group byte-identical files using the cheapest check that separates them:
+    size first, then first/last-block hashes, and a full hash only when those collide.
+
+    Args:
+        paths: Input file paths
+        block_size: Bytes read from each end in the partial pass
+    Returns:
+        dict: Representative path -> list of its duplicates, in input order
+    """
+    identical = []
+    for same_size in _split(paths, os.path.getsize):
+        if len(same_size) == 1:
+            identical.append(same_size)
+            continue
+        for same_ends in _split(same_size, lambda p: partial_hash(p, block_size)):
+            if len(same_ends) == 1 or os.path.getsize(same_ends[0]) <= 2 * block_size:
+                # Small files were hashed in full by the partial pass
+                identical.append(same_ends)
+            else:
+                identical.extend(_split(same_ends, full_hash))
+
+    order = {path: i for i, path in enumerate(paths)}
+    groups = {}
+    for group in sorted(identical, key=lambda g: min(order[p] for p in g)):
+        group = sorted(group, key=order.get)
+        groups[group[0]] = group[1:]
+    return groups
+
+
+def copy_duplicate_outputs(pairs):
+    """
+    Materialize outputs of duplicate inputs from the output of their representative.
+    Args:
+        pairs: Iterable of (representative_output, duplicate_output)
+    """
+    for source, target in pairs:
+        if not os.path.exists(source):
+            print(f"[DEDUP] No output at {source}; cannot fill {target}")
+            continue
+        method = link_or_copy(source, target)
+        print(f"[DEDUP] {os.path.basename(target)}: {method} of {os.path.basename(source)}")
@@ -0,0 +1,101 @@
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflink support
+    fcntl = None
+
+from ffmpeg_runner import run_ffmpeg
+
+FICLONE = 0x40049409  # Linux ioctl for copy-on-write clones (btrfs, xfs)
+
+
+def link_or_copy(src, dst):
+    """
+    Place src at dst without re-encoding: hardlink when possible, plain copy otherwise.
+    Args:
+        src: Existing file
+        dst: Destination path (replaced if it exists)
+    Returns:
+        str: "hardlink" or "copy"
+    """
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return "hardlink"
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        shutil.copy2(src, dst)
+        return "copy"
+
+
+def clone_file(src, dst, allow_hardlink=True):
+    """
+    Place src at dst sharing storage where possible: reflink (copy-on-write clone),
+    then hardlink if allowed, then plain copy.
+    Args:
+        src: Existing file
+        dst: Destination path (replaced if it exists)
+        allow_hardlink: False when dst must stay independent of src (e.g. cache store)
+    Returns:
+        str: "reflink", "hardlink" or "copy"
+    """
+    if os.path.exists(dst):
+        os.remove(dst)
+    if fcntl is not None:
+        try:
+            with open(src, "rb") as source, open(dst, "wb") as target:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            shutil.copystat(src, dst)
+            return "reflink"
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+    if allow_hardlink:
+        return link_or_copy(src, dst)
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def stream_copy(src, dst):
+    """
+    Remux src into dst with every stream copied as-is (no decode, no encode).
+    Args:
+        src: Input media file
+        dst: Output media file
+    """
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i", src,
+        "-map", "0",
+        "-c", "copy",
+        dst,
+    ]
+    run_ffmpeg(cmd, input_path=src, output_path=dst, operation="stream-copy", check=True)
+    return "stream-copy"
+
+
+def materialize_noop(src, dst):
+    """
+    Produce dst from src for a job that would not change the content.
+    Same container: hardlink/copy. Different container: stream copy.
+    Returns:
+        str: Method used, for logging
+    """
+    if os.path.splitext(src)[1].lower() == os.path.splitext(dst)[1].lower():
+        return link_or_copy(src, dst)
+    return stream_copy(src, dst)
+
+
+def is_up_to_date(output_path, *input_paths):
+    """
+    True if output_path exists, is non-empty and is newer than every input.
+    """
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return False
+    output_mtime = os.path.getmtime(output_path)
+    return all(os.path.getmtime(p) <= output_mtime for p in input_paths if os.path.exists(p))
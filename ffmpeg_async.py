@@ -0,0 +1,321 @@
+import os
+import time
+import signal
+import asyncio
+import threading
+import subprocess
+from collections import deque
+
+try:
+    import psutil
+except ImportError:  # Without wait4 and psutil, records carry no CPU time or RSS
+    psutil = None
+
+from ffmpeg_runner import new_record, write_record, encoder_from_cmd, media_from_stderr
+from result_cache import serve_cached, remember
+
+
+async def _pipe_reader(loop, pipe):
+    reader = asyncio.StreamReader(loop=loop)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader, loop=loop), pipe)
+    return reader
+
+
+class _Child:
+    """
+    One supervised process with its resource usage, in run_ffmpeg's record fields.
+
+    Where os.wait4 exists the child is started with subprocess.Popen and reaped by
+    wait4 on a helper thread, which reports its own CPU time and peak RSS. Elsewhere
+    (Windows) asyncio's subprocess support is used and usage is sampled with psutil
+    when it is installed.
+    """
+
+    def __init__(self):
+        self.returncode = None
+        self.usage = {}
+
+    async def start(self, cmd):
+        loop = asyncio.get_running_loop()
+        # No stdin: an overwrite prompt must fail the job instead of hanging the batch
+        if hasattr(os, "wait4"):
+            self.popen = subprocess.Popen(
+                cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            self.pid = self.popen.pid
+            self.stdout = await _pipe_reader(loop, self.popen.stdout)
+            self.stderr = await _pipe_reader(loop, self.popen.stderr)
+            self._exited = loop.create_future()
+            threading.Thread(target=self._reap, args=(loop,), daemon=True).start()
+        else:
+            self.proc = await asyncio.create_subprocess_exec(
+                *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            self.pid = self.proc.pid
+            self.stdout, self.stderr = self.proc.stdout, self.proc.stderr
+            self._sampler = asyncio.ensure_future(self._sample()) if psutil is not None else None
+        return self
+
+    def _reap(self, loop):
+        try:
+            _, status, usage = os.wait4(self.pid, 0)
+            result = (os.waitstatus_to_exitcode(status), {
+                "cpu_user_s": usage.ru_utime, "cpu_sys_s": usage.ru_stime, "max_rss_kb": usage.ru_maxrss,
+            })
+        except ChildProcessError:
+            result = (-1, {})
+        loop.call_soon_threadsafe(self._exited.set_result, result)
+
+    async def _sample(self):
+        try:
+            process = psutil.Process(self.pid)
+            while self.proc.returncode is None:
+                times, rss = process.cpu_times(), process.memory_info().rss
+                self.usage = {
+                    "cpu_user_s": times.user, "cpu_sys_s": times.system,
+                    "max_rss_kb": max(self.usage.get("max_rss_kb", 0), rss // 1024),
+                }
+                await asyncio.sleep(0.5)
+        except psutil.Error:
+            pass
+
+    async def wait(self):
+        if hasattr(self, "_exited"):
+            self.returncode, self.usage = await asyncio.shield(self._exited)
+        else:
+            self.returncode = await self.proc.wait()
+            if self._sampler is not None:
+                self._sampler.cancel()
+        return self.returncode
+
+    def kill(self):
+        if self.returncode is not None:
+            return
+        try:
+            if hasattr(self, "_exited"):
+                # Not Popen.kill: its poll() would reap the child before wait4 sees it
+                os.kill(self.pid, signal.SIGKILL)
+            else:
+                self.proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+class FFmpegSupervisor:
+    """
+    Runs many ffmpeg/ffprobe children from one asyncio event loop, without a
+    Python worker process per job.
+
+    A job is a dict:
+        cmd        argument list (required)
+        input      main input file (metrics, labels)
+        output     main output file (metrics)
+        operation  short name for metrics, e.g. "crop"
+        duration   input duration in seconds, enables progress fractions
+        cache      result_cache params; a hit is served instead of running cmd and a
+                   successful run is remembered (needs input, output and operation)
+    Any other keys (e.g. "index") are passed back untouched.
+
+    on_event(job, status, detail) is called from the event loop with status one of
+    "running", "progress" (detail = fraction 0..1), "retry", "done", "failed", "cancelled".
+    """
+
+    def __init__(self, concurrency=None, timeout=None, retries=1, retry_delay=1.0, on_event=None):
+        self.concurrency = concurrency or os.cpu_count() or 1
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.on_event = on_event or (lambda job, status, detail: None)
+        self.cancelled = False
+        self._procs = set()
+        self._loop = None
+        self._semaphore = None
+
+    def _emit(self, job, status, detail=""):
+        try:
+            self.on_event(job, status, detail)
+        except Exception as e:
+            print(f"Event callback failed: {e}")
+
+    async def _attempt(self, job):
+        cmd = list(job["cmd"])
+        track_progress = os.path.basename(cmd[0]).startswith("ffmpeg") and "-progress" not in cmd
+        if track_progress:
+            cmd[1:1] = ["-progress", "pipe:1", "-nostats"]
+
+        record = new_record(
+            job.get("operation") or os.path.basename(cmd[0]), job.get("input"), job.get("output"),
+            encoder_from_cmd(cmd),
+        )
+        start = time.perf_counter()
+        proc = await _Child().start(cmd)
+        self._procs.add(proc)
+        stdout, stderr_tail, media = [], deque(maxlen=40), {}
+        duration = job.get("duration")
+
+        async def read_stdout():
+            async for line in proc.stdout:
+                if not track_progress:
+                    stdout.append(line)
+                    continue
+                key, _, value = line.decode("utf-8", "replace").strip().partition("=")
+                if key in ("out_time_us", "out_time_ms") and duration and value.isdigit():
+                    # Both keys are in microseconds
+                    self._emit(job, "progress", min(int(value) / 1e6 / duration, 1.0))
+
+        async def read_stderr():
+            async for line in proc.stderr:
+                text = line.decode("utf-8", "replace").rstrip()
+                if len(media) < 3:
+                    media_from_stderr(text, media)
+                stderr_tail.append(text)
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(asyncio.gather(read_stdout(), read_stderr(), proc.wait()), self.timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            proc.kill()
+            await proc.wait()
+        finally:
+            self._procs.discard(proc)
+
+        record.update(
+            wall_s=time.perf_counter() - start,
+            output_bytes=os.path.getsize(job["output"]) if job.get("output") and os.path.exists(job["output"]) else None,
+            returncode=proc.returncode,
+            **proc.usage,
+            **media,
+        )
+        if proc.returncode != 0:
+            record["stderr_tail"] = "\n".join(stderr_tail)[-2000:]
+        write_record(record)
+
+        if self.cancelled:
+            status = "cancelled"
+        elif timed_out:
+            status = "failed"
+            stderr_tail.append(f"timed out after {self.timeout}s")
+        else:
+            status = "done" if proc.returncode == 0 else "failed"
+        return {
+            "job": job,
+            "status": status,
+            "returncode": proc.returncode,
+            "stdout": b"".join(stdout),
+            "stderr_tail": "\n".join(stderr_tail),
+            "wall_s": record["wall_s"],
+        }
+
+    async def run(self, job):
+        """Run one job under the concurrency limit, with timeout and retries."""
+        async with self._semaphore:
+            result, key = None, None
+            if "cache" in job and not self.cancelled:
+                result, key = await self._serve_cached(job)
+                if result is not None:
+                    self._emit(job, "done", "cache hit")
+                    return result
+            for attempt in range(self.retries + 1):
+                if self.cancelled:
+                    break
+                if attempt:
+                    self._emit(job, "retry", attempt)
+                    await asyncio.sleep(self.retry_delay * attempt)
+                self._emit(job, "running")
+                result = await self._attempt(job)
+                result["attempts"] = attempt + 1
+                if result["status"] != "failed":
+                    break
+            if result is None or self.cancelled:
+                result = dict(result or {"job": job, "returncode": None, "stdout": b"", "stderr_tail": ""})
+                result["status"] = "cancelled"
+            elif key is not None and result["status"] == "done":
+                await asyncio.get_running_loop().run_in_executor(
+                    None, remember, key, job["operation"], job["output"]
+                )
+            self._emit(job, result["status"], result["stderr_tail"] if result["status"] == "failed" else "")
+            return result
+
+    async def _serve_cached(self, job):
+        """(result for a cache hit or None, cache key) for a job with "cache" params."""
+        served, key = await asyncio.get_running_loop().run_in_executor(
+            None, serve_cached, job["operation"], job["input"], job["output"], job["cache"]
+        )
+        if not served:
+            return None, key
+        result = {"job": job, "status": "done", "returncode": 0, "stdout": b"", "stderr_tail": "", "wall_s": 0.0}
+        result.update(attempts=0, cached=True)
+        return result, key
+
+    async def run_all(self, jobs):
+        """Run jobs concurrently; results come back in job order."""
+        self._loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self.run(job) for job in jobs))
+
+    def run_batch(self, jobs):
+        """Blocking wrapper around run_all for plain scripts."""
+        self._semaphore = None
+        return asyncio.run(self.run_all(jobs))
+
+    def _kill_all(self):
+        self.cancelled = True
+        for proc in list(self._procs):
+            proc.kill()
+
+    def cancel(self):
+        """Stop all running children and skip queued jobs. Safe to call from any thread."""
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._kill_all)
+        else:
+            self.cancelled = True
+
+
+def index_events(post):
+    """
+    Adapt FFmpegSupervisor events to a BatchJobRunner-style post(index, status, detail).
+    Jobs without an "index" (helper probes etc.) are not reported.
+    """
+    def on_event(job, status, detail):
+        if "index" not in job:
+            return
+        if status == "progress":
+            post(job["index"], "running", f"{detail:.0%}")
+        elif status == "retry":
+            post(job["index"], "running", f"retry {detail}")
+        elif status == "failed":
+            post(job["index"], status, detail.splitlines()[-1] if detail else "")
+        else:
+            post(job["index"], status, detail)
+    return on_event
+
+
+async def _watch_cancel(cancelled, supervisor):
+    while not cancelled.is_set():
+        await asyncio.sleep(0.1)
+    supervisor.cancel()
+
+
+def supervise(main, supervisor, cancelled=None):
+    """
+    Run main(supervisor) on a fresh event loop (e.g. from a GUI background thread).
+    Args:
+        main: Coroutine function taking the supervisor
+        supervisor: FFmpegSupervisor to run jobs on
+        cancelled: Optional threading.Event; once set, running children are killed
+    Returns:
+        Whatever main returns
+    """
+    async def runner():
+        supervisor._loop = asyncio.get_running_loop()
+        watcher = asyncio.ensure_future(_watch_cancel(cancelled, supervisor)) if cancelled is not None else None
+        try:
+            return await main(supervisor)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+    supervisor._semaphore = None
+    return asyncio.run(runner())
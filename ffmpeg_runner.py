@@ -0,0 +1,307 @@
+import os
+import re
+import json
+import time
+import uuid
+import threading
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: no rusage, wall time and byte counts only
+    resource = None
+
+METRICS_DIR = os.environ.get(
+    "VIDEO_TOOLS_METRICS_DIR", os.path.join(os.path.expanduser("~"), ".video_tools", "metrics")
+)
+JSONL_NAME = "ffmpeg_runs.jsonl"
+PROM_NAME = "video_tools_{tool}.prom"
+BATCH_ENV = "VIDEO_TOOLS_BATCH_ID"
+
+# Batch id -> size of the JSON-lines log when the batch started, so finish_batch reads only the tail
+_batch_offsets = {}
+
+_ENCODER_FLAGS = ("-c:v", "-vcodec", "-c:a", "-acodec", "-c", "-codec")
+_DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_VIDEO_SIZE_PATTERN = re.compile(r"Stream #\d+:\d+.*?: Video: .*?, (\d{2,5})x(\d{2,5})")
+
+
+def encoder_from_cmd(cmd):
+    """Pick the encoder names out of an ffmpeg argument list (e.g. 'h264_nvenc,copy')."""
+    encoders = []
+    for flag, value in zip(cmd, cmd[1:]):
+        if flag in _ENCODER_FLAGS and value not in encoders:
+            encoders.append(value)
+    return ",".join(encoders) or None
+
+
+def media_from_stderr(text, found=None):
+    """
+    Input duration and frame size from ffmpeg's stderr banner, for the cost model.
+    The first match wins, so input streams are preferred over output streams.
+    Args:
+        text: stderr text (whole or a single line)
+        found: Dict from an earlier call to extend
+    Returns:
+        dict: Any of media_s, width, height
+    """
+    found = {} if found is None else found
+    if "media_s" not in found:
+        match = _DURATION_PATTERN.search(text)
+        if match:
+            hours, minutes, seconds = match.groups()
+            found["media_s"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    if "width" not in found:
+        match = _VIDEO_SIZE_PATTERN.search(text)
+        if match:
+            found["width"], found["height"] = int(match.group(1)), int(match.group(2))
+    return found
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path) if path else None
+    except OSError:
+        return None
+
+
+def write_record(record):
+    """Append one metrics record to the JSON-lines log (one short write, safe across workers)."""
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        line = json.dumps(record) + "\n"
+        with open(os.path.join(METRICS_DIR, JSONL_NAME), "a", encoding="utf-8") as file:
+            file.write(line)
+    except OSError as e:
+        print(f"Could not write metrics record: {e}")
+
+
+def new_record(operation, input_path, output_path, encoder):
+    """Start a metrics record; callers add timings and write it with write_record()."""
+    return {
+        "batch": os.environ.get(BATCH_ENV),
+        "operation": operation,
+        "input": input_path,
+        "output": output_path,
+        "encoder": encoder,
+        "input_bytes": _size(input_path),
+        "started": time.time(),
+    }
+
+
+def run_ffmpeg(cmd, input_path=None, output_path=None, operation=None, check=False, stdout=subprocess.PIPE):
+    """
+    Drop-in for subprocess.run on ffmpeg/ffprobe commands that records a metrics line.
+
+    Recorded per invocation: wall time, child CPU time and peak RSS (via wait4 where
+    available), input/output bytes, encoder and return code. stderr is always
+    captured; its tail is kept in the record when the command fails.
+
+    Args:
+        cmd: Argument list, as for subprocess.run
+        input_path: Main input file, for byte counts
+        output_path: Main output file, for byte counts
+        operation: Short label such as "crop" or "probe", defaults to the program name
+        check: Raise CalledProcessError on a non-zero exit
+        stdout: subprocess.PIPE to capture, or subprocess.DEVNULL
+    Returns:
+        subprocess.CompletedProcess with stdout/stderr as bytes
+    """
+    record = new_record(operation or os.path.basename(cmd[0]), input_path, output_path, encoder_from_cmd(cmd))
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=stdout, stderr=subprocess.PIPE)
+
+    if hasattr(os, "wait4"):
+        # Drain pipes on threads so wait4 can reap the child and report its own rusage
+        captured = {}
+        readers = [
+            threading.Thread(target=lambda name, pipe: captured.__setitem__(name, pipe.read()), args=(name, pipe))
+            for name, pipe in (("stdout", proc.stdout), ("stderr", proc.stderr)) if pipe is not None
+        ]
+        for reader in readers:
+            reader.start()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        for reader in readers:
+            reader.join()
+        out, err = captured.get("stdout"), captured.get("stderr")
+        record.update(
+            cpu_user_s=usage.ru_utime,
+            cpu_sys_s=usage.ru_stime,
+            max_rss_kb=usage.ru_maxrss,
+        )
+    else:
+        out, err = proc.communicate()
+    for pipe in (proc.stdout, proc.stderr):
+        if pipe is not None:
+            pipe.close()
+
+    record.update(
+        wall_s=time.perf_counter() - start,
+        output_bytes=_size(output_path),
+        returncode=proc.returncode,
+    )
+    if err:
+        text = err.decode("utf-8", "replace")
+        record.update(media_from_stderr(text))
+        if proc.returncode != 0:
+            record["stderr_tail"] = text[-2000:]
+    write_record(record)
+
+    if check and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, out, err)
+    return subprocess.CompletedProcess(cmd, proc.returncode, out, err)
+
+
+@contextmanager
+def measure(operation, input_path=None, output_path=None, encoder=None):
+    """
+    Record an in-process job (OpenCV/moviepy loop) in the same format as run_ffmpeg.
+    CPU time covers this process and any children reaped during the block.
+    Callers may add media_s/width/height to the yielded record for the cost model.
+    """
+    record = new_record(operation, input_path, output_path, encoder)
+    start = time.perf_counter()
+    before = rusage_totals()
+    try:
+        yield record
+        record["returncode"] = 0
+    except Exception:
+        record["returncode"] = 1
+        raise
+    finally:
+        after = rusage_totals()
+        if before and after:
+            record.update(
+                cpu_user_s=after[0] - before[0],
+                cpu_sys_s=after[1] - before[1],
+                max_rss_kb=after[2],
+            )
+        record.update(wall_s=time.perf_counter() - start, output_bytes=_size(output_path))
+        write_record(record)
+
+
+def rusage_totals():
+    """(user s, system s, peak RSS kB) of this process plus reaped children, or None without resource."""
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (
+        own.ru_utime + children.ru_utime,
+        own.ru_stime + children.ru_stime,
+        max(own.ru_maxrss, children.ru_maxrss),
+    )
+
+
+def new_batch_id(tool):
+    """Unique, sortable batch id such as crop-20250101-120000-1a2b3c."""
+    return f"{tool}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def start_batch(tool):
+    """
+    Tag every record written from now on (including by child processes) with a new batch id.
+    Returns:
+        str: The batch id, to pass to finish_batch
+    """
+    batch_id = new_batch_id(tool)
+    path = os.path.join(METRICS_DIR, JSONL_NAME)
+    _batch_offsets[batch_id] = os.path.getsize(path) if os.path.exists(path) else 0
+    os.environ[BATCH_ENV] = batch_id
+    return batch_id
+
+
+def load_records(batch_id=None, offset=0):
+    """
+    Read metrics records from the JSON-lines log, optionally only one batch.
+    Args:
+        batch_id: Only return records of this batch
+        offset: Byte offset to start reading at, e.g. the log size recorded by start_batch
+    Returns:
+        List[dict]: The records in log order
+    """
+    path = os.path.join(METRICS_DIR, JSONL_NAME)
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "rb") as file:
+        file.seek(offset)
+        for line in file:
+            line = line.decode("utf-8", "replace")
+            # Cheap substring test first so other batches' lines are never parsed
+            if batch_id is not None and batch_id not in line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if batch_id is None or record.get("batch") == batch_id:
+                records.append(record)
+    return records
+
+
+def write_prometheus(records, tool):
+    """Write batch totals to the tool's own file in Prometheus textfile-collector format (atomic replace)."""
+    labels = f'tool="{tool}"'
+    failures = sum(1 for r in records if r.get("returncode"))
+    cpu = sum((r.get("cpu_user_s") or 0) + (r.get("cpu_sys_s") or 0) for r in records)
+    # Gauges, not counters: each file holds the totals of its tool's most recent batch
+    metrics = [
+        ("jobs", "Subprocess invocations in the last batch.", len(records)),
+        ("failures", "Invocations with a non-zero exit in the last batch.", failures),
+        ("wall_seconds", "Summed wall time of invocations in the last batch.",
+         round(sum(r.get("wall_s") or 0 for r in records), 3)),
+        ("cpu_seconds", "Summed child CPU time in the last batch.", round(cpu, 3)),
+        ("input_bytes", "Bytes read in the last batch.", sum(r.get("input_bytes") or 0 for r in records)),
+        ("output_bytes", "Bytes written in the last batch.", sum(r.get("output_bytes") or 0 for r in records)),
+        ("max_rss_kilobytes", "Peak child RSS seen in the last batch.",
+         max([r.get("max_rss_kb") or 0 for r in records] or [0])),
+    ]
+    lines = []
+    for name, help_text, value in metrics:
+        lines += [
+            f"# HELP video_tools_last_batch_{name} {help_text}",
+            f"# TYPE video_tools_last_batch_{name} gauge",
+            f"video_tools_last_batch_{name}{{{labels}}} {value}",
+        ]
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, PROM_NAME.format(tool=tool))
+    # Per-process temp name: two tools finishing together must not share it
+    temp_path = path + f".{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+
+def finish_batch(batch_id, tool, slowest=5):
+    """
+    Print a summary of one batch (slowest files, aggregate throughput) and
+    refresh the Prometheus textfile.
+    """
+    records = load_records(batch_id, _batch_offsets.pop(batch_id, 0))
+    os.environ.pop(BATCH_ENV, None)
+    if not records:
+        print("No subprocess metrics recorded for this batch.")
+        return records
+
+    write_prometheus(records, tool)
+    elapsed = max(r["started"] + (r.get("wall_s") or 0) for r in records) - min(r["started"] for r in records)
+    total_in = sum(r.get("input_bytes") or 0 for r in records if r["operation"] not in ("ffprobe", "probe"))
+    cpu = sum((r.get("cpu_user_s") or 0) + (r.get("cpu_sys_s") or 0) for r in records)
+
+    print(f"\n[METRICS] Batch {batch_id}: {len(records)} invocations in {elapsed:.1f}s")
+    print(f"{'wall s':>8} {'cpu s':>8} {'rss MB':>8} {'in MB':>9} {'out MB':>9}  operation  file")
+    for r in sorted(records, key=lambda r: r.get("wall_s") or 0, reverse=True)[:slowest]:
+        rss_mb = (r.get("max_rss_kb") or 0) / 1024
+        cpu_s = (r.get("cpu_user_s") or 0) + (r.get("cpu_sys_s") or 0)
+        print(
+            f"{r.get('wall_s') or 0:8.2f} {cpu_s:8.2f} {rss_mb:8.1f} "
+            f"{(r.get('input_bytes') or 0) / 1e6:9.1f} {(r.get('output_bytes') or 0) / 1e6:9.1f}  "
+            f"{r['operation']:<9}  {os.path.basename(r.get('input') or '-')}"
+        )
+    if elapsed > 0:
+        print(f"[METRICS] Throughput: {total_in / 1e6 / elapsed:.1f} MB/s in, CPU {cpu:.1f}s "
+              f"({cpu / elapsed:.2f} cores busy on average)")
+    return records
@@ -0,0 +1,315 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+import tkinter as tk
+from collections import deque
+
+from memory_watch import kill_tree
+
+
+def _job_main(conn, func, args):
+    """Child process entry: run one job and send its result down the job's own pipe."""
+    try:
+        conn.send(("result", func(*args)))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+def _receive(conn):
+    """The (status, detail) a job sent, or None if it sent nothing readable (crash or kill)."""
+    try:
+        return conn.recv() if conn.poll() else None
+    except Exception:
+        # A job killed mid-send leaves a truncated message; only its own pipe is affected
+        return None
+
+
+def run_in_background(root, func, on_done, poll_ms=100):
+    """
+    Call func() on a daemon thread and on_done(result) on the Tk thread once it returns.
+    An exception from func is passed to on_done as the result.
+    """
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = func()
+        except Exception as e:
+            outcome["result"] = e
+
+    def poll():
+        if "result" in outcome:
+            on_done(outcome["result"])
+        else:
+            root.after(poll_ms, poll)
+
+    threading.Thread(target=target, daemon=True).start()
+    root.after(poll_ms, poll)
+
+
+class BatchJobRunner:
+    """
+    Runs jobs in child processes from a background thread so the Tk main loop
+    stays responsive. Each job gets its own (non-daemon) process, so jobs may
+    start their own pools, and cancel() can kill a job's whole process tree.
+
+    Each job process reports through its own pipe, read by the driving thread, so
+    killing one never leaves a shared queue half-written.
+
+    Jobs that only drive ffmpeg children can instead run on a background thread
+    of this process (start_thread), e.g. through an FFmpegSupervisor.
+
+    Events are delivered on the Tk thread through root.after polling as
+    on_event(index, status, detail) with status one of
+    "queued", "running", "done", "failed", "cancelled".
+    """
+
+    def __init__(self, root, on_event, on_finished, poll_ms=100):
+        self.root = root
+        self.on_event = on_event
+        self.on_finished = on_finished
+        self.poll_ms = poll_ms
+        self.events = None
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()  # cancel() and starting a job process exclude each other
+        self.active = {}
+        self.running = False
+
+    def start(self, jobs, func, workers=None, succeeded=bool):
+        """
+        Start a batch.
+        Args:
+            jobs: List of argument tuples, one per job
+            func: Picklable module-level function called as func(*args) in a child process
+            workers: Concurrent job processes, defaults to the CPU count
+            succeeded: Predicate on func's return value
+        """
+        self._begin(len(jobs), queue.Queue(), succeeded)
+        threading.Thread(
+            target=self._drive, args=(list(jobs), func, workers or os.cpu_count() or 1), daemon=True
+        ).start()
+        self.root.after(self.poll_ms, self._poll)
+
+    def start_thread(self, count, target):
+        """
+        Start a batch that runs in this process on a background thread.
+        Args:
+            count: Number of jobs, for per-file status
+            target: Called as target(post, cancelled); post(index, status, detail) reports
+                    "running", "done", "failed" or "cancelled" for a job index, and
+                    cancelled is a threading.Event set by cancel()
+        """
+        self._begin(count, queue.Queue(), bool)
+
+        def drive():
+            try:
+                target(lambda index, status, detail="": self.events.put((index, status, detail)), self.cancelled)
+            except Exception as e:
+                print(f"Batch failed: {e}")
+                for index in range(count):
+                    self.events.put((index, "exited", f"batch error: {e}"))
+            self.events.put((None, "finished", ""))
+
+        threading.Thread(target=drive, daemon=True).start()
+        self.root.after(self.poll_ms, self._poll)
+
+    def _begin(self, count, events, succeeded):
+        if self.running:
+            raise RuntimeError("A batch is already running.")
+        self.events = events
+        self.cancelled.clear()
+        self.active = {}
+        self.running = True
+        self.succeeded = succeeded
+        self.statuses = ["queued"] * count
+        for index in range(count):
+            self.on_event(index, "queued", "")
+
+    def _drive(self, jobs, func, workers):
+        pending = deque(enumerate(jobs))
+        pipes = {}
+        while (pending or self.active) and not self.cancelled.is_set():
+            while pending and len(self.active) < workers:
+                with self._lock:
+                    if self.cancelled.is_set():
+                        break
+                    index, args = pending.popleft()
+                    reader, writer = multiprocessing.Pipe(duplex=False)
+                    process = multiprocessing.Process(target=_job_main, args=(writer, func, args))
+                    process.start()
+                    writer.close()  # The child holds the only write end, so its exit means EOF
+                    pipes[index] = reader
+                    self.active[index] = process
+                self.events.put((index, "running", ""))
+            for index, process in list(self.active.items()):
+                # Check for exit first: everything the child sent is then already in the pipe.
+                # A running child is read too, since a large result blocks it until read.
+                exited = not process.is_alive()
+                if pipes[index] is not None:
+                    message = _receive(pipes[index])
+                    if message is not None:
+                        self.events.put((index,) + tuple(message))
+                    if message is not None or exited:
+                        pipes[index].close()
+                        pipes[index] = None
+                if exited:
+                    process.join()
+                    del self.active[index], pipes[index]
+                    self.events.put((index, "exited", process.exitcode))
+            time.sleep(0.05)
+
+        for index, _ in pending:
+            self.events.put((index, "cancelled", "not started"))
+        for process in self.active.values():
+            process.join()
+        for reader in pipes.values():
+            if reader is not None:
+                reader.close()
+        self.events.put((None, "finished", ""))
+
+    def cancel(self):
+        """Stop in-flight jobs (and their ffmpeg children) and drop queued ones."""
+        if not self.running:
+            return
+        with self._lock:
+            self.cancelled.set()
+            for index, process in list(self.active.items()):
+                kill_tree(process)
+                self.events.put((index, "cancelled", "stopped"))
+
+    def _poll(self):
+        finished = False
+        while True:
+            try:
+                index, status, detail = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if status == "finished":
+                finished = True
+                continue
+            if self.statuses[index] in ("done", "failed", "cancelled"):
+                continue
+            if status == "result":
+                status = "done" if self.succeeded(detail) else "failed"
+                detail = "" if detail is True else str(detail)
+            elif status == "error":
+                status = "failed"
+            elif status == "exited":
+                # Process ended without posting a result (crash or kill)
+                status = "cancelled" if self.cancelled.is_set() else "failed"
+                detail = f"exit code {detail}"
+            self.statuses[index] = status
+            self.on_event(index, status, detail)
+
+        if finished:
+            self.running = False
+            counts = {s: self.statuses.count(s) for s in ("done", "failed", "cancelled")}
+            self.on_finished(counts)
+        else:
+            self.root.after(self.poll_ms, self._poll)
+
+
+class JobPanel:
+    """
+    Progress label, per-file status list and Cancel button backed by a BatchJobRunner.
+    """
+
+    def __init__(self, root, height=8, width=80):
+        self.root = root
+        frame = tk.Frame(root)
+        frame.pack(pady=5, fill="both", expand=True)
+        self.progress_label = tk.Label(frame, text="", justify="left")
+        self.progress_label.pack()
+        self.listbox = tk.Listbox(frame, height=height, width=width)
+        self.listbox.pack(fill="both", expand=True)
+        self.cancel_button = tk.Button(frame, text="Cancel", state="disabled", command=self.cancel)
+        self.cancel_button.pack(pady=5)
+        self.runner = BatchJobRunner(root, self._on_event, self._on_finished)
+        self.preparing = False
+
+    def run(self, labels, jobs, func, workers=None, succeeded=bool, on_finished=None, on_progress=None):
+        """
+        Start a batch and show its progress.
+        Args:
+            labels: Display name per job (usually the file name)
+            jobs: Argument tuple per job
+            func: Job function, see BatchJobRunner.start
+            workers: Concurrent jobs
+            succeeded: Predicate on the job's return value
+            on_finished: Called with {"done": n, "failed": n, "cancelled": n} on the Tk thread
+            on_progress: Called with the percentage of finished jobs
+        """
+        self.labels = list(labels)
+        self.finished_callback = on_finished
+        self.progress_callback = on_progress
+        self.listbox.delete(0, tk.END)
+        for label in self.labels:
+            self.listbox.insert(tk.END, f"{label} - queued")
+        self.cancel_button.config(state="normal")
+        self.runner.start(jobs, func, workers=workers, succeeded=succeeded)
+
+    def run_thread(self, labels, target, on_finished=None, on_progress=None):
+        """
+        Start an in-process batch (see BatchJobRunner.start_thread) and show its progress.
+        """
+        self.labels = list(labels)
+        self.finished_callback = on_finished
+        self.progress_callback = on_progress
+        self.listbox.delete(0, tk.END)
+        for label in self.labels:
+            self.listbox.insert(tk.END, f"{label} - queued")
+        self.cancel_button.config(state="normal")
+        self.runner.start_thread(len(self.labels), target)
+
+    def prepare(self, func, start):
+        """
+        Call func() on a background thread (e.g. hashing the inputs for dedup), then
+        start(result) on the Tk thread, which usually calls run or run_thread.
+        The panel counts as running meanwhile, so a second click cannot start a batch.
+        """
+        self.preparing = True
+        self.progress_label.config(text="Preparing batch...")
+
+        def done(result):
+            self.preparing = False
+            if isinstance(result, Exception):
+                self.progress_label.config(text=f"Preparing failed: {result}")
+                return
+            start(result)
+
+        run_in_background(self.root, func, done)
+
+    @property
+    def running(self):
+        return self.preparing or self.runner.running
+
+    def cancel(self):
+        self.progress_label.config(text="Cancelling...")
+        self.runner.cancel()
+
+    def _on_event(self, index, status, detail):
+        if not hasattr(self, "labels") or index >= len(self.labels):
+            return
+        text = f"{self.labels[index]} - {status}" + (f": {detail}" if detail else "")
+        self.listbox.delete(index)
+        self.listbox.insert(index, text)
+        statuses = self.runner.statuses
+        done = sum(1 for s in statuses if s in ("done", "failed", "cancelled"))
+        self.progress_label.config(
+            text=f"{done}/{len(statuses)} finished, "
+                 f"{statuses.count('running')} running, {statuses.count('failed')} failed"
+        )
+        if self.progress_callback and statuses:
+            self.progress_callback(done / len(statuses) * 100)
+
+    def _on_finished(self, counts):
+        self.cancel_button.config(state="disabled")
+        self.progress_label.config(
+            text=f"Finished: {counts['done']} done, {counts['failed']} failed, {counts['cancelled']} cancelled"
+        )
+        if self.finished_callback:
+            self.finished_callback(counts)
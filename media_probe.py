@@ -0,0 +1,92 @@
+import json
+
+from ffmpeg_runner import run_ffmpeg
+
+
+def probe_command(video_path):
+    """ffprobe arguments used by probe_video, for callers that run the process themselves."""
+    return [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries",
+        "format=duration,size:stream=codec_type,codec_name,width,height,r_frame_rate,pix_fmt",
+        "-of", "json",
+        video_path,
+    ]
+
+
+def parse_probe(output):
+    """
+    Turn probe_command output into the probe_video dict.
+    Args:
+        output: ffprobe stdout (bytes)
+    Returns:
+        dict or None if there is no video stream
+    """
+    data = json.loads(output.decode("utf-8"))
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        return None
+
+    num, _, den = video.get("r_frame_rate", "0/1").partition("/")
+    fps = float(num) / float(den) if den and float(den) else 0.0
+    fmt = data.get("format", {})
+    return {
+        "width": int(video.get("width", 0)),
+        "height": int(video.get("height", 0)),
+        "duration": float(fmt.get("duration", 0) or 0),
+        "fps": fps,
+        "codec": video.get("codec_name"),
+        "pix_fmt": video.get("pix_fmt"),
+        "size": int(fmt.get("size", 0) or 0),
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+    }
+
+
+def probe_video(video_path):
+    """
+    Read stream and container details of a video with a single ffprobe call.
+    Args:
+        video_path: Path to the input video
+    Returns:
+        dict: width, height, duration, fps, codec, pix_fmt, size and has_audio,
+              or None if the file could not be probed
+    """
+    try:
+        result = run_ffmpeg(probe_command(video_path), input_path=video_path, operation="probe", check=True)
+        return parse_probe(result.stdout)
+    except Exception as e:
+        print(f"Error probing {video_path}: {e}")
+        return None
+
+
+def probe_keyframes(video_path):
+    """
+    List keyframe timestamps of the first video stream without decoding other frames.
+    Args:
+        video_path: Path to the input video
+    Returns:
+        List[float]: Keyframe presentation times in seconds, sorted
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-skip_frame", "nokey",
+        "-show_entries", "frame=pts_time",
+        "-of", "csv=p=0",
+        video_path,
+    ]
+    try:
+        result = run_ffmpeg(cmd, input_path=video_path, operation="probe", check=True)
+    except Exception as e:
+        print(f"Error reading keyframes of {video_path}: {e}")
+        return []
+
+    times = []
+    for line in result.stdout.decode("utf-8").splitlines():
+        line = line.strip().rstrip(",")
+        if line and line != "N/A":
+            times.append(float(line))
+    return sorted(times)
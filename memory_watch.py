@@ -0,0 +1,134 @@
+import os
+import signal
+import threading
+import subprocess
+
+try:
+    import psutil
+except ImportError:  # Optional: falls back to /proc on Linux
+    psutil = None
+
+
+def _proc_rss(pid):
+    """Resident set size of a pid in bytes from /proc, or 0 if unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _proc_children(pid):
+    """Direct child pids of a pid from /proc, or [] if unavailable."""
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children", "r") as file:
+                children.extend(int(c) for c in file.read().split())
+    except (OSError, ValueError):
+        pass
+    return children
+
+
+def descendant_pids(pid=None):
+    """
+    All descendant process ids of a process, parents before children.
+    Args:
+        pid: Root process id, defaults to the current process
+    Returns:
+        List[int]: Empty if they cannot be listed on this platform
+    """
+    pid = pid or os.getpid()
+    if psutil is not None:
+        try:
+            return [child.pid for child in psutil.Process(pid).children(recursive=True)]
+        except psutil.Error:
+            return []
+
+    found, stack = [], _proc_children(pid)
+    while stack:
+        current = stack.pop(0)
+        found.append(current)
+        stack.extend(_proc_children(current))
+    return found
+
+
+def kill_tree(process):
+    """
+    Stop a job process and everything it started (ffmpeg children, segment pools).
+    """
+    if os.name == "nt":
+        # taskkill walks the process tree itself, so this works without psutil
+        try:
+            subprocess.run(
+                ["taskkill", "/T", "/F", "/PID", str(process.pid)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+        except OSError:
+            pass
+        process.terminate()
+        return
+    for pid in reversed(descendant_pids(process.pid)):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+    process.terminate()
+
+
+def tree_rss(pid=None):
+    """
+    Current RSS of a process plus all of its descendants (e.g. ffmpeg readers/writers).
+    Args:
+        pid: Root process id, defaults to the current process
+    Returns:
+        int: Bytes, or 0 if it cannot be measured on this platform
+    """
+    pid = pid or os.getpid()
+    if psutil is not None:
+        total = 0
+        for current in [pid] + descendant_pids(pid):
+            try:
+                total += psutil.Process(current).memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    return sum(_proc_rss(current) for current in [pid] + descendant_pids(pid))
+
+
+class PeakRSSSampler:
+    """
+    Context manager that samples tree_rss() on a background thread and keeps the peak.
+
+    Usage:
+        with PeakRSSSampler() as sampler:
+            render()
+        print(sampler.peak_mb)
+    """
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, tree_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = tree_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, tree_rss())
+        return False
+
+    @property
+    def peak_mb(self):
+        return self.peak / (1024 * 1024)
@@ -2,7 +2,14 @@ import os
 import cv2
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import multiprocessing
+from segment_encode import encode_in_segments
+from media_probe import probe_video
+from fast_paths import materialize_noop
+from ffmpeg_runner import measure, start_batch, finish_batch
+from worker_profiling import profiled, start_profiling, finish_profiling
+from result_cache import cached_run
+from job_runner import JobPanel, run_in_background
+from cost_model import plan, format_plan
 
 
 def resize_video(video_path, output_dir, width, height):
@@ -14,26 +21,39 @@ def resize_video(video_path, output_dir, width, height):
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             return f"Failed to open: {video_path}"
-        
-        # Set up the video writer
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
+
         video_name = os.path.basename(video_path)
         output_path = os.path.join(output_dir, video_name)
 
+        # Skip the decode/encode loop if the video is already at the target size
+        source_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        if source_size == (width, height):
+            cap.release()
+            method = materialize_noop(video_path, output_path)
+            return f"Skipped (already {width}x{height}, {method}): {video_path}"
+
+        # Set up the video writer
+        fourcc = cv2.VideoWriter_fourcc(*'XVID')
+
         out = cv2.VideoWriter(output_path, fourcc, cap.get(cv2.CAP_PROP_FPS), (width, height))
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break  # End of video
-            # Resize the frame
-            resized_frame = cv2.resize(frame, (width, height))
-            # Write resized frame
-            out.write(resized_frame)
+        with measure("resize", video_path, output_path, "opencv-xvid") as record:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            if fps:
+                record["media_s"] = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+            record["width"], record["height"] = source_size
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break  # End of video
+                # Resize the frame
+                resized_frame = cv2.resize(frame, (width, height))
+                # Write resized frame
+                out.write(resized_frame)
+            out.release()  # Flush before measure() reads the output size
 
         # Release resources
         cap.release()
-        out.release()
         cv2.destroyAllWindows()
 
         return f"Processed: {video_path}"
@@ -41,19 +61,65 @@ def resize_video(video_path, output_dir, width, height):
         return f"Failed: {video_path}, Error: {str(e)}"
 
 
+def resize_segment(segment_path, segment_output, width, height):
+    """
+    Resize one piece of a segmented video into the given output path.
+    """
+    result = resize_video(segment_path, os.path.dirname(segment_output), width, height)
+    print(result)
+    return result.startswith(("Processed", "Skipped"))
+
+
+def resize_video_segmented(video_path, output_dir, width, height, segments=None):
+    """
+    Resizes one long video by splitting it at keyframes and resizing the pieces in parallel.
+    Only video-only inputs are segmented: the OpenCV writer has no audio track, so
+    pieces would lose the audio the split keeps. Each piece restarts the encoder, so
+    the output is not bit-identical to a single pass.
+    """
+    output_path = os.path.join(output_dir, os.path.basename(video_path))
+    info = probe_video(video_path)
+    if info and (info["width"], info["height"]) == (width, height):
+        method = materialize_noop(video_path, output_path)
+        return f"Skipped (already {width}x{height}, {method}): {video_path}"
+    if info is None or info["has_audio"]:
+        print(f"Resizing {video_path} in a single pass (segments are only used for video-only inputs).")
+        return resize_video(video_path, output_dir, width, height)
+    if encode_in_segments(video_path, output_path, resize_segment, (width, height), segments=segments):
+        return f"Processed: {video_path}"
+    return f"Failed: {video_path}"
+
+
+def resize_video_cached(video_path, output_dir, width, height, segmented=False):
+    """
+    Resizes a video through the shared result cache; a hit is served without decoding.
+    """
+    resize = resize_video_segmented if segmented else resize_video
+    result = cached_run(
+        "resize", video_path, os.path.join(output_dir, os.path.basename(video_path)),
+        {"size": f"{int(width)}x{int(height)}", "fourcc": "XVID"},
+        lambda: resize(video_path, output_dir, width, height),
+        version=f"opencv-{cv2.__version__}",
+        succeeded=lambda r: r.startswith("Processed"),
+    )
+    return f"Cache hit: {video_path}" if result is True else result
+
+
+@profiled("resize")
 def worker_process(video_path, output_dir, width, height):
     """
     Worker function for multiprocessing to resize videos concurrently.
     """
-    result = resize_video(video_path, output_dir, width, height)
+    result = resize_video_cached(video_path, output_dir, width, height)
     print(result)  # Log progress
+    return result
 
 
 class VideoResizerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Video Frame Resizer")
-        self.root.geometry("600x400")
+        self.root.geometry("600x650")
 
         # Select directory
         tk.Label(root, text="Select Directory with Videos").pack(pady=5)
@@ -68,21 +134,60 @@ class VideoResizerApp:
         tk.Entry(root, textvariable=self.width_var, width=20).pack(side=tk.LEFT, padx=5)
         tk.Entry(root, textvariable=self.height_var, width=20).pack(side=tk.LEFT, padx=5)
 
-        # Process Button
+        # Segment mode for a few long videos
+        self.segment_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            root, text="Split long videos into parallel segments", variable=self.segment_var
+        ).pack(pady=5)
+
+        # Process Buttons
+        tk.Button(root, text="Plan (dry run)", command=self.plan_batch).pack(pady=2)
         tk.Button(root, text="Resize Videos", command=self.start_processing).pack(pady=10)
 
         # Status Label
         self.status_label = tk.Label(root, text="", wraplength=500, justify="left")
         self.status_label.pack(pady=10)
 
+        # Per-file status, progress and cancel
+        self.jobs = JobPanel(root)
+
     def select_directory(self):
         """Open a file dialog to select directory."""
         directory = filedialog.askdirectory(title="Select Video Directory")
         if directory:
             self.directory_var.set(directory)
 
+    def plan_batch(self):
+        """Dry run: predict wall time, CPU-hours and output size from past runs."""
+        directory = self.directory_var.get()
+        if not directory:
+            messagebox.showerror("Error", "Please select a directory first.")
+            return
+        video_files = [
+            os.path.join(directory, file)
+            for file in os.listdir(directory)
+            if file.lower().endswith((".mp4", ".avi", ".mkv", ".mov"))
+        ]
+        if not video_files:
+            messagebox.showerror("Error", "No supported video files found in the directory.")
+            return
+
+        self.status_label.config(text=f"Planning {len(video_files)} videos...")
+
+        def show(summary):
+            if isinstance(summary, Exception):
+                self.status_label.config(text=f"Planning failed: {summary}")
+                return
+            self.status_label.config(text="\n".join(format_plan(summary)))
+
+        run_in_background(self.root, lambda: plan("resize", video_files), show)
+
     def start_processing(self):
-        """Start resizing videos with multiprocessing."""
+        """Start resizing videos in the background job runner."""
+        if self.jobs.running:
+            messagebox.showerror("Error", "A batch is already running.")
+            return
+
         directory = self.directory_var.get()
         if not directory:
             messagebox.showerror("Error", "Please select a directory first.")
@@ -110,24 +215,37 @@ class VideoResizerApp:
         output_dir = os.path.join(directory, "output")
         os.makedirs(output_dir, exist_ok=True)
 
-        # Start multiprocessing with worker functions
+        # Run jobs in the background so the window stays responsive
         self.status_label.config(text=f"Processing {len(video_files)} videos...")
-        processes = []
-        for video_file in video_files:
-            process = multiprocessing.Process(
-                target=worker_process, args=(video_file, output_dir, target_width, target_height)
+        batch_id = start_batch("resize")
+        profile_dir = start_profiling("resize")
+
+        def finished(counts):
+            finish_batch(batch_id, "resize")
+            finish_profiling(profile_dir)
+            self.status_label.config(
+                text=f"Resized {counts['done']} of {len(video_files)} videos. Output saved in {output_dir}"
+            )
+            messagebox.showinfo(
+                "Done",
+                f"Resizing finished: {counts['done']} done, {counts['failed']} failed, "
+                f"{counts['cancelled']} cancelled.",
             )
-            process.start()
-            processes.append(process)
 
-        # Wait for all processes to finish
-        for process in processes:
-            process.join()
+        labels = [os.path.basename(video_file) for video_file in video_files]
+        jobs = [(video_file, output_dir, target_width, target_height) for video_file in video_files]
 
-        self.status_label.config(
-            text=f"Resized {len(video_files)} videos. Output saved in {output_dir}"
-        )
-        messagebox.showinfo("Done", "All videos have been resized successfully.")
+        def succeeded(result):
+            return not result.startswith("Failed")
+
+        if self.segment_var.get():
+            # One video at a time, each spread across all cores
+            self.jobs.run(
+                labels, [job + (True,) for job in jobs], resize_video_cached,
+                workers=1, succeeded=succeeded, on_finished=finished,
+            )
+        else:
+            self.jobs.run(labels, jobs, worker_process, succeeded=succeeded, on_finished=finished)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,393 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+from textwrap import wrap
+
+from fast_paths import materialize_noop
+from ffmpeg_runner import start_batch, finish_batch
+from ffmpeg_async import FFmpegSupervisor, index_events, supervise
+from media_probe import probe_command, parse_probe
+
+try:
+    import yaml
+except ImportError:  # JSON specs and the Python builder still work
+    yaml = None
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm")
+GLYPH_WIDTH_EM = 0.6  # Average glyph width as a fraction of the font size, for wrapping drawtext
+
+
+def overlay_texts(folder, text_file):
+    """
+    Overlay text per entry of folder, in simple.add_padding_and_text's order:
+    line N of text_file belongs to the N-th entry of os.listdir(folder), counting
+    every entry (not only videos).
+    Returns:
+        dict: File name -> text, in listing order
+    """
+    with open(text_file, "r", encoding="utf-8") as file:
+        text_lines = file.readlines()
+    return {
+        filename: text_lines[index].strip() if index < len(text_lines) else "No Text Available"
+        for index, filename in enumerate(os.listdir(folder))
+    }
+
+
+def wrap_to_width(text, pixels, font_size, limit=None):
+    """
+    Wrap text at word boundaries to about `pixels` wide. drawtext, unlike TextClip's
+    size=(width, None), has no width limit, so lines are wrapped using an average
+    glyph width; this approximates the limit, it does not measure the font.
+    Args:
+        text: Text to wrap
+        pixels: Available width
+        font_size: Font size in pixels
+        limit: Optional maximum characters per line
+    """
+    chars = max(1, int(pixels / (font_size * GLYPH_WIDTH_EM)))
+    return "\n".join(wrap(text, width=min(chars, limit or chars))) or text
+
+
+def _filter_value(value):
+    """
+    Escape a filter option value for an ffmpeg filtergraph passed as one argument:
+    first for the option parser, then for the filtergraph parser.
+    """
+    text = str(value)
+    for special in ("\\':", "\\'[],;"):
+        text = "".join("\\" + c if c in special else c for c in text)
+    return text
+
+
+def _filter(name, **options):
+    return name + "=" + ":".join(f"{key}={_filter_value(value)}" for key, value in options.items())
+
+
+class Pipeline:
+    """
+    Crop -> resize -> pad and text overlay -> strip metadata -> rename, compiled
+    into one ffmpeg command per video: a single decode, one crop,scale,pad,drawtext
+    filter chain and a single encode, with no intermediate files.
+
+    Build it with the chainable methods, e.g.
+        Pipeline().crop(1280, 720, 0, 0).resize(640, 360).strip_metadata().rename("Day_{index}{ext}")
+    or from a spec (see from_spec) stored as JSON or YAML.
+    """
+
+    STEPS = ("crop", "resize", "pad_text", "strip_metadata", "rename")
+
+    def __init__(self, codec="libx264", audio_codec="copy", encoder_options=None):
+        self.codec = codec
+        self.audio_codec = audio_codec
+        self.encoder_options = list(encoder_options or [])
+        self.steps = []
+
+    def crop(self, width, height, x=0, y=0):
+        """Crop to width x height at (x, y); clamped to the frame like the cropper."""
+        self.steps.append(("crop", {"width": int(width), "height": int(height), "x": int(x), "y": int(y)}))
+        return self
+
+    def resize(self, width, height):
+        """Scale to width x height; -1 or -2 keeps the aspect ratio (-2: even size)."""
+        self.steps.append(("resize", {"width": int(width), "height": int(height)}))
+        return self
+
+    def pad_text(
+        self,
+        padding,
+        heading="Video Heading",
+        text=None,
+        text_file=None,
+        heading_font="Arial",
+        heading_font_size=50,
+        heading_color="red",
+        heading_position_offset=0,
+        text_font="Arial",
+        text_font_size=40,
+        text_color="black",
+        text_position_offset=20,
+    ):
+        """
+        White padding with a heading and wrapped text above the video, laid out like
+        simple.add_padding_and_text. The text is `text`, or the text_file line that
+        add_padding_and_text gives the input's file name (see overlay_texts).
+        """
+        self.steps.append(("pad_text", {
+            "padding": dict(padding), "heading": heading, "text": text, "text_file": text_file,
+            "heading_font": heading_font, "heading_font_size": int(heading_font_size),
+            "heading_color": heading_color, "heading_position_offset": int(heading_position_offset),
+            "text_font": text_font, "text_font_size": int(text_font_size),
+            "text_color": text_color, "text_position_offset": int(text_position_offset),
+        }))
+        return self
+
+    def strip_metadata(self):
+        """Drop container and stream metadata (-map_metadata -1)."""
+        self.steps.append(("strip_metadata", {}))
+        return self
+
+    def rename(self, template="Day_{index}{ext}"):
+        """Name outputs from a template with {index} (1-based), {stem} and {ext}."""
+        self.steps.append(("rename", {"template": template}))
+        return self
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Build a pipeline from a dict such as
+            {"encode": {"codec": "h264_nvenc", "audio_codec": "copy"},
+             "steps": [{"crop": {"width": 1280, "height": 720, "x": 0, "y": 0}},
+                       {"resize": {"width": 640, "height": -2}},
+                       {"strip_metadata": {}},
+                       {"rename": {"template": "Day_{index}{ext}"}}]}
+        """
+        pipeline = cls(**spec.get("encode", {}))
+        for step in spec.get("steps", []):
+            if not isinstance(step, dict) or len(step) != 1:
+                raise ValueError(f"Each step must be a single-key mapping, got {step!r}")
+            (name, options), = step.items()
+            if name not in cls.STEPS:
+                raise ValueError(f"Unknown pipeline step: {name}")
+            getattr(pipeline, name)(**(options or {}))
+        return pipeline
+
+    @classmethod
+    def load(cls, path):
+        """Read a spec from a .json, .yaml or .yml file."""
+        with open(path, "r", encoding="utf-8") as file:
+            if path.lower().endswith((".yaml", ".yml")):
+                if yaml is None:
+                    raise RuntimeError("PyYAML is not installed; use a JSON spec instead.")
+                return cls.from_spec(yaml.safe_load(file))
+            return cls.from_spec(json.load(file))
+
+    def spec(self):
+        """The pipeline as a spec dict (also part of the result cache key)."""
+        return {
+            "encode": {
+                "codec": self.codec, "audio_codec": self.audio_codec, "encoder_options": self.encoder_options,
+            },
+            "steps": [{name: options} for name, options in self.steps],
+        }
+
+    def _options(self, name):
+        return [options for step, options in self.steps if step == name]
+
+    def output_name(self, input_path, index):
+        """File name of the final output for the index-th (0-based) input."""
+        stem, ext = os.path.splitext(os.path.basename(input_path))
+        for options in self._options("rename"):
+            return options["template"].format(index=index + 1, stem=stem, ext=ext)
+        return stem + ext
+
+    def texts(self, inputs):
+        """Overlay text per input path, keyed by file name within its folder (see overlay_texts)."""
+        texts = ["No Text Available"] * len(inputs)
+        for options in self._options("pad_text"):
+            if options["text"] is not None:
+                texts = [options["text"]] * len(inputs)
+            elif options["text_file"]:
+                by_folder = {}
+                for index, path in enumerate(inputs):
+                    folder = os.path.dirname(path) or "."
+                    if folder not in by_folder:
+                        by_folder[folder] = overlay_texts(folder, options["text_file"])
+                    texts[index] = by_folder[folder].get(os.path.basename(path), "No Text Available")
+        return texts
+
+    def filters(self, width, height, text=None):
+        """
+        The filter chain for an input of width x height.
+        text is the overlay text; it defaults to the pad_text step's fixed text.
+        Returns:
+            Tuple[List[str], Tuple[int, int]]: Filters in step order and the output frame size
+        """
+        chain = []
+        if text is None:
+            text = next(
+                (o["text"] for o in self._options("pad_text") if o["text"] is not None), "No Text Available"
+            )
+        for name, options in self.steps:
+            if name == "crop":
+                x, y = options["x"], options["y"]
+                crop_width, crop_height = min(options["width"], width - x), min(options["height"], height - y)
+                if crop_width <= 0 or crop_height <= 0:
+                    raise ValueError(f"Crop offset ({x}, {y}) is outside the {width}x{height} frame")
+                if (crop_width, crop_height) != (width, height):
+                    chain.append(f"crop={crop_width}:{crop_height}:{x}:{y}")
+                    width, height = crop_width, crop_height
+            elif name == "resize":
+                new_width, new_height = options["width"], options["height"]
+                if new_width < 0:
+                    new_width = round(new_height * width / height)
+                    new_width -= new_width % 2 if options["width"] == -2 else 0
+                if new_height < 0:
+                    new_height = round(new_width * height / width)
+                    new_height -= new_height % 2 if options["height"] == -2 else 0
+                if (new_width, new_height) != (width, height):
+                    chain.append(f"scale={new_width}:{new_height}")
+                    width, height = new_width, new_height
+            elif name == "pad_text":
+                chain += self._pad_text_filters(options, width, height, text)
+                padding = options["padding"]
+                side = int(width * padding["left"])
+                top = int(height * padding["top"])
+                width, height = (
+                    width + 2 * side,
+                    height + top + options["heading_font_size"] * 3 + int(height * padding["bottom"]),
+                )
+        return chain, (width, height)
+
+    @staticmethod
+    def _pad_text_filters(options, width, height, text):
+        padding = options["padding"]
+        top = int(height * padding["top"])
+        bottom = int(height * padding["bottom"])
+        side = int(width * padding["left"])
+        text_height = options["heading_font_size"] * 3  # Approximate height for heading and text
+
+        def font(value):
+            return {"fontfile": value} if value.lower().endswith((".ttf", ".otf", ".ttc")) else {"font": value}
+
+        return [
+            _filter(
+                "pad", w=width + 2 * side, h=height + top + text_height + bottom,
+                x=side, y=top + text_height, color="white",
+            ),
+            # Wrapped to the widths simple.add_padding_and_text gives its TextClips
+            _filter(
+                "drawtext", text=wrap_to_width(options["heading"], width, options["heading_font_size"]),
+                expansion="none", **font(options["heading_font"]),
+                fontsize=options["heading_font_size"], fontcolor=options["heading_color"],
+                x="(w-text_w)/2",
+                y=top // 2 - options["heading_font_size"] + options["heading_position_offset"],
+            ),
+            _filter(
+                "drawtext", text=wrap_to_width(text, width - 40, options["text_font_size"], limit=50),
+                expansion="none", **font(options["text_font"]),
+                fontsize=options["text_font_size"], fontcolor=options["text_color"],
+                x="(w-text_w)/2",
+                y=top // 2 + options["heading_font_size"] + options["text_position_offset"],
+            ),
+        ]
+
+    def command(self, input_path, output_path, info, text=None):
+        """
+        The single ffmpeg command for one input.
+        Args:
+            input_path: Input video
+            output_path: Final output path (already renamed)
+            info: parse_probe() result for the input
+            text: Overlay text for this input, see filters()
+        Returns:
+            List[str]: ffmpeg arguments, or None if the pipeline leaves the file untouched
+        """
+        chain, _ = self.filters(info["width"], info["height"], text)
+        strip = bool(self._options("strip_metadata"))
+        if not chain and not strip:
+            return None
+        cmd = ["ffmpeg", "-y", "-i", input_path]
+        if chain:
+            cmd += ["-map", "0:v:0", "-map", "0:a?", "-vf", ",".join(chain), "-c:v", self.codec]
+            cmd += self.encoder_options + ["-c:a", self.audio_codec]
+        else:
+            cmd += ["-map", "0", "-c", "copy"]
+        if strip:
+            cmd += ["-map_metadata", "-1"]
+        return cmd + [output_path]
+
+    async def run_async(self, supervisor, inputs, output_folder):
+        """
+        Run the pipeline over inputs from one event loop: probe, resolve no-ops, then
+        one ffmpeg child per remaining video (the supervisor serves cache hits per job).
+        Returns:
+            List[str]: Output path per input, None where it failed
+        """
+        loop = asyncio.get_running_loop()
+        notify = supervisor.on_event
+        probes = await supervisor.run_all([
+            {"cmd": probe_command(path), "input": path, "operation": "probe"} for path in inputs
+        ])
+        texts = self.texts(inputs)
+
+        outputs = [None] * len(inputs)
+        jobs = []
+        for index, (input_path, probe) in enumerate(zip(inputs, probes)):
+            output_path = os.path.join(output_folder, self.output_name(input_path, index))
+            job = {"index": index, "input": input_path, "output": output_path, "operation": "pipeline"}
+            info = parse_probe(probe["stdout"]) if probe["status"] == "done" else None
+            if not info:
+                notify(job, "failed", f"Could not probe {input_path}")
+                continue
+            try:
+                cmd = self.command(input_path, output_path, info, texts[index])
+            except ValueError as e:
+                notify(job, "failed", str(e))
+                continue
+            if cmd is None:
+                method = await loop.run_in_executor(None, materialize_noop, input_path, output_path)
+                print(f"[NO-OP] Pipeline leaves {input_path} unchanged; used {method} instead of re-encoding.")
+                outputs[index] = output_path
+                notify(job, "done", f"no-op ({method})")
+                continue
+
+            job.update(
+                cmd=cmd, duration=info["duration"], cache={"pipeline": self.spec(), "text": texts[index]}
+            )
+            jobs.append(job)
+
+        for result in await supervisor.run_all(jobs):
+            job = result["job"]
+            if result["status"] == "done":
+                outputs[job["index"]] = job["output"]
+                print(f"[SUCCESS] {os.path.basename(job['input'])} -> {job['output']}")
+            elif result["status"] == "failed":
+                print(f"[FAILURE] {job['input']}\n{result['stderr_tail']}")
+        return outputs
+
+    def run(self, inputs, output_folder, concurrency=None, post=None, cancelled=None):
+        """
+        Blocking wrapper around run_async with its own FFmpegSupervisor.
+        Args:
+            inputs: Input videos, in the order used for {index}
+            output_folder: Folder for the final outputs
+            concurrency: Concurrent ffmpeg children, defaults to the CPU count
+            post: Optional post(index, status, detail) progress callback (see job_runner)
+            cancelled: Optional threading.Event that stops the batch
+        """
+        os.makedirs(output_folder, exist_ok=True)
+        supervisor = FFmpegSupervisor(
+            concurrency=concurrency, on_event=index_events(post or (lambda index, status, detail="": None))
+        )
+        return supervise(lambda s: self.run_async(s, list(inputs), output_folder), supervisor, cancelled)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a crop/resize/pad/strip/rename pipeline as one ffmpeg pass.")
+    parser.add_argument("spec", help="Pipeline spec (.json, or .yaml with PyYAML installed)")
+    parser.add_argument("input_folder")
+    parser.add_argument("output_folder")
+    parser.add_argument("--concurrency", type=int, help="Concurrent ffmpeg processes, defaults to the CPU count")
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline.load(args.spec)
+    inputs = sorted(
+        os.path.join(args.input_folder, f) for f in os.listdir(args.input_folder)
+        if f.lower().endswith(VIDEO_EXTENSIONS)
+    )
+    if not inputs:
+        print(f"No video files found in {args.input_folder}")
+        return 1
+
+    batch_id = start_batch("pipeline")
+    outputs = pipeline.run(inputs, args.output_folder, concurrency=args.concurrency)
+    finish_batch(batch_id, "pipeline")
+    failed = sum(1 for output in outputs if output is None)
+    print(f"\n[COMPLETED] {len(outputs) - failed} of {len(outputs)} videos processed.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,64 @@
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import threading
-import multiprocessing
 import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ffmpeg_runner import run_ffmpeg, start_batch, finish_batch
+from dedup import find_duplicates, copy_duplicate_outputs
+from result_cache import cached_run
+from ffmpeg_async import FFmpegSupervisor, index_events, supervise
+from job_runner import JobPanel, run_in_background
+from cost_model import plan, format_plan
+
+
+# ffmpeg arguments of the extraction, as part of its result cache key
+EXTRACT_PARAMS = {"q:a": 0, "map": "a"}
+
+
+def audio_output_path(video_path, output_dir):
+    """MP3 path that extract_audio_with_gpu writes for a video."""
+    audio_name = os.path.splitext(os.path.basename(video_path))[0] + ".mp3"
+    return os.path.join(output_dir, audio_name)
+
+
+def extract_command(video_path, output_path):
+    """ffmpeg command that extracts the audio of one video to MP3."""
+    # Use ffmpeg with NVIDIA's GPU acceleration (CUDA) here
+    # Ensure ffmpeg has GPU/CUDA support
+    return [
+        "ffmpeg",
+        "-hwaccel", "cuda",  # Enable GPU hardware acceleration with CUDA
+        "-i", video_path,
+        "-q:a", "0",  # Set audio quality
+        "-map", "a",
+        output_path,
+        "-y",  # Automatically overwrite output files
+    ]
 
 
 def extract_audio_with_gpu(video_path, output_dir):
-    """Extract audio from a video file using GPU acceleration with ffmpeg."""
+    """Extract audio from a video file using GPU acceleration with ffmpeg (served from the result cache when possible)."""
+    return cached_run(
+        "extract-audio", video_path, audio_output_path(video_path, output_dir),
+        EXTRACT_PARAMS,
+        lambda: _extract_audio_with_gpu(video_path, output_dir),
+        succeeded=lambda r: r is True,
+    )
+
+
+def _extract_audio_with_gpu(video_path, output_dir):
+    """Run the ffmpeg extraction for one video."""
     try:
         video_name = os.path.basename(video_path)
-        audio_name = os.path.splitext(video_name)[0] + ".mp3"
-        output_path = os.path.join(output_dir, audio_name)
-
-        # Use ffmpeg with NVIDIA's GPU acceleration (CUDA) here
-        # Ensure ffmpeg has GPU/CUDA support
-        command = [
-            "ffmpeg",
-            "-hwaccel", "cuda",  # Enable GPU hardware acceleration with CUDA
-            "-i", video_path,
-            "-q:a", "0",  # Set audio quality
-            "-map", "a",
-            output_path,
-            "-y",  # Automatically overwrite output files
-        ]
+        output_path = audio_output_path(video_path, output_dir)
 
         # Call subprocess for GPU-based ffmpeg execution
-        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        run_ffmpeg(
+            extract_command(video_path, output_path), input_path=video_path, output_path=output_path,
+            operation="extract-audio", stdout=subprocess.DEVNULL,
+        )
 
         if os.path.exists(output_path):
             return True
@@ -36,41 +68,77 @@ def extract_audio_with_gpu(video_path, output_dir):
         return f"Error processing {video_path}: {e}"
 
 
-def init_worker(lock_, completed_tasks_, total_tasks_, queue_):
-    """Setup shared variables for multiprocessing workers."""
-    global lock, completed_tasks, total_tasks, queue
-    lock = lock_
-    completed_tasks = completed_tasks_
-    total_tasks = total_tasks_
-    queue = queue_
-
-
-def worker(video_path_output):
-    """Worker logic for GPU-accelerated extraction."""
-    video_path, output_dir = video_path_output
-    result = extract_audio_with_gpu(video_path, output_dir)
-
-    with lock:
-        completed_tasks.value += 1
-        progress = (completed_tasks.value / total_tasks) * 100
-        queue.put((progress, result))
+def plan_extraction(video_list, output_dir):
+    """Extract each distinct input once; identical copies reuse its MP3.
+    Returns the videos to extract and (original_mp3, copy_mp3) pairs to fill afterwards."""
+    duplicates = find_duplicates(video_list)
+    duplicate_outputs = [
+        (audio_output_path(original, output_dir), audio_output_path(copy, output_dir))
+        for original, copies in duplicates.items()
+        for copy in copies
+    ]
+    return list(duplicates), duplicate_outputs
+
+
+async def extract_batch_async(supervisor, video_list, output_dir):
+    """
+    Extract audio from many videos as ffmpeg children of one event loop.
+    Cache hits are served by the supervisor; jobs are tagged with their index in video_list.
+    Returns:
+        List: True or an error message per video, like extract_audio_with_gpu
+    """
+    results = [None] * len(video_list)
+    jobs = []
+    for index, video_path in enumerate(video_list):
+        output_path = audio_output_path(video_path, output_dir)
+        jobs.append({
+            "index": index, "input": video_path, "output": output_path, "operation": "extract-audio",
+            "cmd": extract_command(video_path, output_path), "cache": EXTRACT_PARAMS,
+        })
+
+    for result in await supervisor.run_all(jobs):
+        job = result["job"]
+        if result["status"] == "done" and os.path.exists(job["output"]):
+            results[job["index"]] = True
+        elif result["status"] == "cancelled":
+            results[job["index"]] = f"Cancelled: {os.path.basename(job['input'])}."
+        else:
+            results[job["index"]] = f"GPU extraction failed for {os.path.basename(job['input'])}."
+    return results
+
+
+def extract_batch(video_list, output_dir, concurrency=None, post=None, cancelled=None):
+    """
+    Extract audio from many videos with one asyncio supervisor instead of a process pool.
+    Args:
+        video_list: Input videos
+        output_dir: Folder for the MP3 files
+        concurrency: Concurrent ffmpeg children, defaults to the CPU count
+        post: Optional post(index, status, detail) progress callback (see job_runner)
+        cancelled: Optional threading.Event that stops the batch
+    """
+    supervisor = FFmpegSupervisor(
+        concurrency=concurrency, on_event=index_events(post or (lambda index, status, detail="": None))
+    )
+    return supervise(lambda s: extract_batch_async(s, video_list, output_dir), supervisor, cancelled)
 
 
 def process_videos(video_list, output_dir, queue):
-    """Process video list using multiprocessing."""
+    """Process video list with concurrent ffmpeg children, reporting (progress, result) on queue."""
     os.makedirs(output_dir, exist_ok=True)
+    batch_id = start_batch("extract-audio")
+    unique_videos, duplicate_outputs = plan_extraction(video_list, output_dir)
+    finished = set()
 
-    with multiprocessing.Manager() as manager:
-        lock = manager.Lock()
-        completed_tasks = manager.Value('i', 0)
-        total_tasks = len(video_list)
-
-        args = [(video, output_dir) for video in video_list]
+    def post(index, status, detail=""):
+        if status in ("done", "failed", "cancelled") and index not in finished:
+            finished.add(index)
+            result = True if status == "done" else f"{os.path.basename(unique_videos[index])}: {status} {detail}"
+            queue.put((len(finished) / len(unique_videos) * 100, result))
 
-        with multiprocessing.Pool(
-            initializer=init_worker, initargs=(lock, completed_tasks, total_tasks, queue)
-        ) as pool:
-            pool.map(worker, args)
+    extract_batch(unique_videos, output_dir, post=post)
+    copy_duplicate_outputs(duplicate_outputs)
+    finish_batch(batch_id, "extract-audio")
 
 
 class AudioExtractorGUI:
@@ -78,7 +146,7 @@ class AudioExtractorGUI:
         """Initialize GUI."""
         self.root = root
         self.root.title("GPU-Based Audio Extractor")
-        self.root.geometry("500x300")
+        self.root.geometry("500x550")
 
         self.video_dir = tk.StringVar()
         self.output_dir = tk.StringVar()
@@ -93,7 +161,8 @@ class AudioExtractorGUI:
         tk.Entry(root, textvariable=self.output_dir, width=50).pack(pady=5)
         tk.Button(root, text="Browse", command=self.select_output_dir).pack(pady=5)
 
-        # Start button
+        # Start buttons
+        tk.Button(root, text="Plan (dry run)", command=self.plan_batch).pack(pady=2)
         tk.Button(root, text="Start GPU Processing", command=self.start_processing).pack(pady=10)
 
         # Progress bar
@@ -108,6 +177,9 @@ class AudioExtractorGUI:
         self.status_label = tk.Label(root, text="", fg="blue", wraplength=400, justify="left")
         self.status_label.pack(pady=5)
 
+        # Per-file status and cancel
+        self.jobs = JobPanel(root, width=60)
+
     def select_video_dir(self):
         """Choose video directory."""
         directory = filedialog.askdirectory(title="Select Video Directory")
@@ -120,8 +192,37 @@ class AudioExtractorGUI:
         if directory:
             self.output_dir.set(directory)
 
+    def plan_batch(self):
+        """Dry run: predict wall time, CPU-hours and output size from past runs."""
+        video_dir = self.video_dir.get()
+        if not video_dir:
+            messagebox.showerror("Error", "Please select a video directory.")
+            return
+        video_files = [
+            os.path.join(video_dir, f)
+            for f in os.listdir(video_dir)
+            if f.lower().endswith((".mp4", ".avi", ".mov", ".mkv"))
+        ]
+        if not video_files:
+            messagebox.showerror("Error", "No video files found in selected directory.")
+            return
+
+        self.status_label.config(text=f"Planning {len(video_files)} videos...")
+
+        def show(summary):
+            if isinstance(summary, Exception):
+                self.status_label.config(text=f"Planning failed: {summary}")
+                return
+            self.status_label.config(text="\n".join(format_plan(summary)))
+
+        run_in_background(self.root, lambda: plan("extract-audio", video_files), show)
+
     def start_processing(self):
-        """Start processing with GPU."""
+        """Start processing with GPU; ffmpeg children are supervised from a background thread."""
+        if self.jobs.running:
+            messagebox.showerror("Error", "A batch is already running.")
+            return
+
         video_dir = self.video_dir.get()
         output_dir = self.output_dir.get()
 
@@ -139,33 +240,34 @@ class AudioExtractorGUI:
             messagebox.showerror("Error", "No video files found in selected directory.")
             return
 
-        # Status & Queue setup
-        self.queue = multiprocessing.Queue()
-        threading.Thread(target=self.process_videos_thread, args=(video_files, output_dir)).start()
-        self.root.after(100, self.update_progress)
-
-    def process_videos_thread(self, video_files, output_dir):
-        """Handle the worker logic."""
-        try:
-            process_videos(video_files, output_dir, self.queue)
-            self.queue.put("DONE")
-        except Exception as e:
-            self.queue.put(f"ERROR: {e}")
-
-    def update_progress(self):
-        """Update GUI progress from multiprocessing feedback."""
-        while not self.queue.empty():
-            message = self.queue.get()
-            if isinstance(message, str):
-                if message == "DONE":
-                    self.status_label.config(text="Processing complete.")
-                    self.progress.set(100)
-            elif isinstance(message, tuple):
-                progress, status = message
-                self.progress.set(progress)
-                self.status_label.config(text=status)
-
-        self.root.after(100, self.update_progress)
+        os.makedirs(output_dir, exist_ok=True)
+        self.status_label.config(text=f"Checking {len(video_files)} videos for duplicates...")
+        # Hashing reads every input, so it runs off the Tk thread
+        self.jobs.prepare(
+            lambda: plan_extraction(video_files, output_dir),
+            lambda planned: self.run_batch(output_dir, *planned),
+        )
+
+    def run_batch(self, output_dir, unique_videos, duplicate_outputs):
+        """Extract the distinct videos of plan_extraction(), then fill in the duplicates."""
+        batch_id = start_batch("extract-audio")
+
+        def finished(counts):
+            copy_duplicate_outputs(duplicate_outputs)
+            finish_batch(batch_id, "extract-audio")
+            self.progress.set(100)
+            self.status_label.config(
+                text=f"Processing complete: {counts['done']} done, {counts['failed']} failed, "
+                     f"{counts['cancelled']} cancelled."
+            )
+
+        self.status_label.config(text=f"Extracting audio from {len(unique_videos)} videos...")
+        self.jobs.run_thread(
+            [os.path.basename(video) for video in unique_videos],
+            lambda post, cancelled: extract_batch(unique_videos, output_dir, post=post, cancelled=cancelled),
+            on_finished=finished,
+            on_progress=self.progress.set,
+        )
 
 
 # Main Application Entry
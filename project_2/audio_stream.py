@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import subprocess
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ffmpeg_runner import new_record, write_record, encoder_from_cmd, media_from_stderr
+
+try:
+    import numpy
+except ImportError:  # Byte chunks still work without numpy
+    numpy = None
+
+# Raw PCM formats: ffmpeg muxer -> (bytes per sample, numpy dtype)
+SAMPLE_FORMATS = {
+    "s16le": (2, "<i2"),
+    "s32le": (4, "<i4"),
+    "f32le": (4, "<f4"),
+    "u8": (1, "u1"),
+}
+
+
+def pcm_command(video_path, sample_rate=16000, channels=1, sample_format="s16le"):
+    """ffmpeg command that decodes the first audio stream to raw PCM on stdout."""
+    if sample_format not in SAMPLE_FORMATS:
+        raise ValueError(f"Unsupported sample format {sample_format}; use one of {sorted(SAMPLE_FORMATS)}")
+    return [
+        "ffmpeg", "-nostdin", "-hide_banner", "-nostats",
+        "-i", video_path,
+        "-map", "0:a:0", "-vn",
+        "-ac", str(channels), "-ar", str(sample_rate),
+        "-f", sample_format, "-c:a", "pcm_" + sample_format,
+        "pipe:1",
+    ]
+
+
+def encoded_command(video_path, codec="libmp3lame", container="mp3", bitrate="192k"):
+    """ffmpeg command that encodes the first audio stream to a streamable container on stdout."""
+    return [
+        "ffmpeg", "-nostdin", "-hide_banner", "-nostats",
+        "-i", video_path,
+        "-map", "0:a:0", "-vn",
+        "-c:a", codec, "-b:a", bitrate,
+        "-f", container,
+        "pipe:1",
+    ]
+
+
+class AudioStream:
+    """
+    Iterator over byte chunks of ffmpeg's stdout, with no temp file.
+
+    Backpressure comes from the pipe: when the consumer stops reading, the pipe
+    buffer fills and ffmpeg blocks on its next write, so at most one chunk plus the
+    pipe buffer is held in memory. stderr is drained on a thread so ffmpeg never
+    blocks on logging. Closing the stream early (or leaving a with block) stops
+    ffmpeg. One metrics record is written per stream.
+    """
+
+    def __init__(self, cmd, chunk_bytes, input_path=None, operation="stream-audio"):
+        self.cmd = cmd
+        self.chunk_bytes = chunk_bytes
+        self.record = new_record(operation, input_path, None, encoder_from_cmd(cmd))
+        self.bytes_read = 0
+        self.stderr_tail = deque(maxlen=40)
+        self.media = {}
+        self._start = time.perf_counter()
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._stderr_reader = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_reader.start()
+        self.closed = False
+
+    def _drain_stderr(self):
+        for line in self.proc.stderr:
+            text = line.decode("utf-8", "replace").rstrip()
+            if len(self.media) < 3:
+                media_from_stderr(text, self.media)
+            self.stderr_tail.append(text)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        chunk = self.proc.stdout.read(self.chunk_bytes)
+        if not chunk:
+            # ffmpeg closes stdout before it exits: let it finish instead of killing it
+            self._finish(wait_timeout=30)
+            if self.proc.returncode != 0:
+                raise RuntimeError(
+                    f"ffmpeg exited with {self.proc.returncode}: "
+                    + (self.stderr_tail[-1] if self.stderr_tail else "no output")
+                )
+            raise StopIteration
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def close(self):
+        """Stop ffmpeg if it is still running (early close) and write the metrics record."""
+        self._finish()
+
+    def _finish(self, wait_timeout=None):
+        """Reap ffmpeg; kill it unless it exits within wait_timeout seconds (None: kill now)."""
+        if self.closed:
+            return
+        self.closed = True
+        if wait_timeout is not None:
+            try:
+                self.proc.wait(timeout=wait_timeout)
+            except subprocess.TimeoutExpired:
+                pass
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        self.proc.stdout.close()
+        self._stderr_reader.join(timeout=1)
+        self.record.update(
+            wall_s=time.perf_counter() - self._start,
+            output_bytes=self.bytes_read,
+            returncode=self.proc.returncode,
+            **self.media,
+        )
+        if self.proc.returncode != 0:
+            self.record["stderr_tail"] = "\n".join(self.stderr_tail)[-2000:]
+        write_record(self.record)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def stream_pcm(video_path, sample_rate=16000, channels=1, sample_format="s16le", chunk_seconds=1.0):
+    """
+    Stream a video's audio as raw PCM.
+    Args:
+        video_path: Input video file path
+        sample_rate: Output sample rate in Hz
+        channels: Output channel count (interleaved)
+        sample_format: Key of SAMPLE_FORMATS, e.g. "s16le" or "f32le"
+        chunk_seconds: Audio per chunk; every chunk but the last is exactly this long
+    Returns:
+        AudioStream: Iterator of bytes chunks, usable as a context manager
+    """
+    cmd = pcm_command(video_path, sample_rate, channels, sample_format)
+    frames = max(int(sample_rate * chunk_seconds), 1)
+    return AudioStream(cmd, frames * SAMPLE_FORMATS[sample_format][0] * channels, input_path=video_path)
+
+
+def stream_encoded(video_path, codec="libmp3lame", container="mp3", bitrate="192k", chunk_bytes=64 * 1024):
+    """
+    Stream a video's audio as an encoded byte stream (MP3 by default, or e.g. "adts"
+    for AAC or "ogg" for Opus). Chunks are not aligned to codec frames.
+    Returns:
+        AudioStream: Iterator of bytes chunks, usable as a context manager
+    """
+    return AudioStream(
+        encoded_command(video_path, codec, container, bitrate), chunk_bytes,
+        input_path=video_path, operation="stream-audio-encoded",
+    )
+
+
+def pcm_arrays(video_path, sample_rate=16000, channels=1, sample_format="f32le", chunk_seconds=1.0):
+    """
+    Like stream_pcm, but yields numpy arrays of shape (frames, channels). Requires numpy.
+    """
+    if numpy is None:
+        raise RuntimeError("numpy is not installed; use stream_pcm for byte chunks.")
+    dtype = numpy.dtype(SAMPLE_FORMATS[sample_format][1])
+    with stream_pcm(video_path, sample_rate, channels, sample_format, chunk_seconds) as stream:
+        for chunk in stream:
+            yield numpy.frombuffer(chunk, dtype=dtype).reshape(-1, channels)
+
+
+async def astream_pcm(video_path, sample_rate=16000, channels=1, sample_format="s16le", chunk_seconds=1.0):
+    """
+    Async generator version of stream_pcm for asyncio consumers. ffmpeg is paused by
+    the pipe while the consumer awaits other work, and killed if the generator is closed early.
+    """
+    cmd = pcm_command(video_path, sample_rate, channels, sample_format)
+    chunk_bytes = max(int(sample_rate * chunk_seconds), 1) * SAMPLE_FORMATS[sample_format][0] * channels
+    record = new_record("stream-audio", video_path, None, encoder_from_cmd(cmd))
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stderr_tail, media, bytes_read = deque(maxlen=40), {}, 0
+
+    async def drain_stderr():
+        async for line in proc.stderr:
+            text = line.decode("utf-8", "replace").rstrip()
+            if len(media) < 3:
+                media_from_stderr(text, media)
+            stderr_tail.append(text)
+
+    drain = asyncio.ensure_future(drain_stderr())
+    try:
+        while True:
+            try:
+                chunk = await proc.stdout.readexactly(chunk_bytes)
+            except asyncio.IncompleteReadError as e:
+                chunk = e.partial
+            if not chunk:
+                break
+            bytes_read += len(chunk)
+            yield chunk
+        await proc.wait()
+        await drain
+        if proc.returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg exited with {proc.returncode}: " + (stderr_tail[-1] if stderr_tail else "no output")
+            )
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+        await drain
+        record.update(
+            wall_s=time.perf_counter() - start, output_bytes=bytes_read, returncode=proc.returncode, **media
+        )
+        if proc.returncode != 0:
+            record["stderr_tail"] = "\n".join(stderr_tail)[-2000:]
+        write_record(record)
@@ -1,9 +1,22 @@
 import os
-import subprocess
-import multiprocessing
+import sys
+import asyncio
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from segment_encode import encode_in_segments
+from fast_paths import materialize_noop
+from ffmpeg_runner import run_ffmpeg, start_batch, finish_batch
+from worker_profiling import profile_job, start_profiling, finish_profiling
+from dedup import find_duplicates, copy_duplicate_outputs
+from result_cache import cached_run
+from ffmpeg_async import FFmpegSupervisor, index_events, supervise
+from media_probe import probe_command, parse_probe
+from job_runner import JobPanel, run_in_background
+from cost_model import plan, format_plan
+from crop_detect import detect_crops, batch_crop, preview_thumbnail
+
 
 def get_video_dimensions(video_path):
     """
@@ -23,7 +36,7 @@ def get_video_dimensions(video_path):
             "-of", "csv=p=0",
             video_path,
         ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        result = run_ffmpeg(cmd, input_path=video_path, operation="probe", check=True)
         dims = result.stdout.decode('utf-8').strip().split(',')
         width, height = int(dims[0]), int(dims[1])
         print(f"Detected video dimensions for {video_path}: Width={width}, Height={height}")
@@ -33,6 +46,68 @@ def get_video_dimensions(video_path):
         return None, None
 
 
+def plan_crop(input_path, crop_width, crop_height, x_offset, y_offset):
+    """
+    Validate crop params against the real frame size and detect full-frame (no-op) crops.
+    Args:
+        input_path: Input video file path
+        crop_width: Crop width (in pixels)
+        crop_height: Crop height (in pixels)
+        x_offset: Horizontal crop offset
+        y_offset: Vertical crop offset
+    Returns:
+        Tuple[int, int, bool]: Clamped crop width, height and whether the crop is a no-op,
+        or None if the dimensions could not be determined
+    """
+    # Determine actual video dimensions to validate crop params
+    actual_width, actual_height = get_video_dimensions(input_path)
+    if not actual_width or not actual_height:
+        print(f"Invalid video dimensions for {input_path}. Skipping...")
+        return None
+    return clamp_crop(input_path, actual_width, actual_height, crop_width, crop_height, x_offset, y_offset)
+
+
+def clamp_crop(input_path, actual_width, actual_height, crop_width, crop_height, x_offset, y_offset):
+    """
+    Fit crop params into a known frame size and detect full-frame (no-op) crops.
+    Returns:
+        Tuple[int, int, bool]: Clamped crop width, height and whether the crop is a no-op
+    """
+    # Ensure crop dimensions and offsets fit within video dimensions
+    if crop_width + x_offset > actual_width or crop_height + y_offset > actual_height:
+        print(f"Crop parameters invalid for {input_path}. Adjusting crop.")
+        crop_width = min(crop_width, actual_width - x_offset)
+        crop_height = min(crop_height, actual_height - y_offset)
+
+    is_noop = (
+        x_offset == 0 and y_offset == 0
+        and crop_width == actual_width and crop_height == actual_height
+    )
+    return crop_width, crop_height, is_noop
+
+
+def crop_command(input_path, output_path, crop_width, crop_height, x_offset, y_offset):
+    """FFmpeg command with GPU-based NVENC for one crop."""
+    return [
+        "ffmpeg",
+        "-y",
+        "-i", input_path,
+        "-filter:v", f"crop={crop_width}:{crop_height}:{x_offset}:{y_offset}",
+        "-c:v", "h264_nvenc",  # NVENC GPU encoder
+        "-c:a", "copy",
+        output_path,
+    ]
+
+
+def crop_cache_params(crop_width, crop_height, x_offset, y_offset):
+    """Normalized crop parameters for the result cache key."""
+    return {
+        "crop": f"{int(crop_width)}:{int(crop_height)}:{int(x_offset)}:{int(y_offset)}",
+        "vcodec": "h264_nvenc",
+        "acodec": "copy",
+    }
+
+
 def crop_video(input_path, output_path, crop_width, crop_height, x_offset, y_offset):
     """
     Crop a single video using ffmpeg with GPU acceleration.
@@ -45,31 +120,20 @@ def crop_video(input_path, output_path, crop_width, crop_height, x_offset, y_off
         y_offset: Vertical crop offset
     """
     try:
-        # Determine actual video dimensions to validate crop params
-        actual_width, actual_height = get_video_dimensions(input_path)
-        if not actual_width or not actual_height:
-            print(f"Invalid video dimensions for {input_path}. Skipping...")
+        plan = plan_crop(input_path, crop_width, crop_height, x_offset, y_offset)
+        if plan is None:
             return False
+        crop_width, crop_height, is_noop = plan
 
-        # Ensure crop dimensions and offsets fit within video dimensions
-        if crop_width + x_offset > actual_width or crop_height + y_offset > actual_height:
-            print(f"Crop parameters invalid for {input_path}. Adjusting crop.")
-            crop_width = min(crop_width, actual_width - x_offset)
-            crop_height = min(crop_height, actual_height - y_offset)
+        if is_noop:
+            method = materialize_noop(input_path, output_path)
+            print(f"[NO-OP] Crop covers the full frame of {input_path}; used {method} instead of re-encoding.")
+            return True
 
-        # FFmpeg command with GPU-based NVENC
-        cmd = [
-            "ffmpeg",
-            "-y",
-            "-i", input_path,
-            "-filter:v", f"crop={crop_width}:{crop_height}:{x_offset}:{y_offset}",
-            "-c:v", "h264_nvenc",  # NVENC GPU encoder
-            "-c:a", "copy",
-            output_path,
-        ]
+        cmd = crop_command(input_path, output_path, crop_width, crop_height, x_offset, y_offset)
         print(f"Running command: {' '.join(cmd)}")
         # Run the command
-        process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+        process = run_ffmpeg(cmd, input_path=input_path, output_path=output_path, operation="crop")
         
         if process.returncode != 0:
             print(f"FFmpeg failed for video: {input_path}")
@@ -84,25 +148,128 @@ def crop_video(input_path, output_path, crop_width, crop_height, x_offset, y_off
         return False
 
 
-def worker(args):
+def crop_video_segmented(input_path, output_path, crop_width, crop_height, x_offset, y_offset, segments=None):
     """
-    Worker for multiprocessing to handle video cropping.
+    Crop one long video by splitting it at keyframes and cropping the pieces in parallel.
     Args:
-        args: Tuple containing all necessary parameters
+        input_path: Input video file path
+        output_path: Path for saving cropped video
+        crop_width: Crop width (in pixels)
+        crop_height: Crop height (in pixels)
+        x_offset: Horizontal crop offset
+        y_offset: Vertical crop offset
+        segments: Number of pieces, defaults to the CPU count
+    """
+    plan = plan_crop(input_path, crop_width, crop_height, x_offset, y_offset)
+    if plan is None:
+        return False
+    if plan[2]:
+        method = materialize_noop(input_path, output_path)
+        print(f"[NO-OP] Crop covers the full frame of {input_path}; used {method} instead of re-encoding.")
+        return True
+    return encode_in_segments(
+        input_path, output_path, crop_video,
+        (crop_width, crop_height, x_offset, y_offset), segments=segments,
+    )
+
+
+def crop_video_cached(input_path, output_path, crop_width, crop_height, x_offset, y_offset, segmented=False):
+    """
+    Crop a video through the shared result cache; a hit is served without encoding.
+    Args:
+        input_path: Input video file path
+        output_path: Path for saving cropped video
+        crop_width: Crop width (in pixels)
+        crop_height: Crop height (in pixels)
+        x_offset: Horizontal crop offset
+        y_offset: Vertical crop offset
+        segmented: Use the keyframe-segmented parallel encoder on a miss
     """
-    input_file, output_file, crop_width, crop_height, x_offset, y_offset = args
-    success = crop_video(input_file, output_file, crop_width, crop_height, x_offset, y_offset)
-    if success:
-        print(f"[SUCCESS]: {os.path.basename(input_file)} cropped successfully.")
-    else:
-        print(f"[FAILURE]: Could not crop {os.path.basename(input_file)}")
+    crop = crop_video_segmented if segmented else crop_video
+    return cached_run(
+        "crop", input_path, output_path, crop_cache_params(crop_width, crop_height, x_offset, y_offset),
+        lambda: crop(input_path, output_path, crop_width, crop_height, x_offset, y_offset),
+    )
+
+
+async def crop_batch_async(supervisor, args):
+    """
+    Crop many videos from one event loop: probe all inputs, resolve no-ops, then
+    run the remaining crops under the supervisor, which serves cache hits per job.
+    Args:
+        supervisor: FFmpegSupervisor (its on_event sees jobs tagged with "index")
+        args: Argument tuples (input, output, crop_width, crop_height, x_offset, y_offset)
+    Returns:
+        List[bool]: Success per input
+    """
+    loop = asyncio.get_running_loop()
+    notify = supervisor.on_event
+    probes = await supervisor.run_all([
+        {"cmd": probe_command(a[0]), "input": a[0], "operation": "probe"} for a in args
+    ])
+
+    success = [False] * len(args)
+    jobs = []
+    for index, (arg, probe) in enumerate(zip(args, probes)):
+        input_path, output_path, crop_width, crop_height, x_offset, y_offset = arg
+        job = {"index": index, "input": input_path, "output": output_path, "operation": "crop"}
+        info = parse_probe(probe["stdout"]) if probe["status"] == "done" else None
+        if not info:
+            notify(job, "failed", f"Invalid video dimensions for {input_path}")
+            continue
+
+        crop_width, crop_height, is_noop = clamp_crop(
+            input_path, info["width"], info["height"], crop_width, crop_height, x_offset, y_offset
+        )
+        if is_noop:
+            method = await loop.run_in_executor(None, materialize_noop, input_path, output_path)
+            print(f"[NO-OP] Crop covers the full frame of {input_path}; used {method} instead of re-encoding.")
+            success[index] = True
+            notify(job, "done", f"no-op ({method})")
+            continue
+
+        job.update(
+            cmd=crop_command(input_path, output_path, crop_width, crop_height, x_offset, y_offset),
+            duration=info["duration"],
+            cache=crop_cache_params(*arg[2:]),
+        )
+        jobs.append(job)
+
+    for result in await supervisor.run_all(jobs):
+        job = result["job"]
+        if result["status"] == "done":
+            success[job["index"]] = True
+            if not result.get("cached"):
+                print(f"Processed and saved video: {job['output']}")
+        elif result["status"] == "failed":
+            print(f"FFmpeg failed for video: {job['input']}\n{result['stderr_tail']}")
+    return success
+
+
+def crop_batch(args, concurrency=None, post=None, cancelled=None):
+    """
+    Crop many videos with one asyncio supervisor instead of a Python process pool.
+    Args:
+        args: Argument tuples (input, output, crop_width, crop_height, x_offset, y_offset)
+        concurrency: Concurrent ffmpeg children, defaults to the CPU count
+        post: Optional post(index, status, detail) progress callback (see job_runner)
+        cancelled: Optional threading.Event that stops the batch
+    Returns:
+        List[bool]: Success per input
+    """
+    supervisor = FFmpegSupervisor(
+        concurrency=concurrency, on_event=index_events(post or (lambda index, status, detail="": None))
+    )
+    # The supervisor thread does the batch's Python work; the ffmpeg children are not profiled
+    with profile_job("crop"):
+        return supervise(lambda s: crop_batch_async(s, args), supervisor, cancelled)
 
 
 class VideoCropApp:
     def __init__(self, root):
         self.root = root
         self.root.title("GPU-Accelerated Bulk Video Cropper")
-        self.root.geometry("700x500")
+        self.root.geometry("700x1000")
 
         # UI Elements
         tk.Label(root, text="Select Input Directory with Videos").pack(pady=5)
@@ -129,26 +296,123 @@ class VideoCropApp:
         self.y_offset_var = tk.IntVar(value=0)
         tk.Entry(root, textvariable=self.y_offset_var).pack(pady=2)
 
+        self.segment_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            root, text="Split long videos into parallel segments", variable=self.segment_var
+        ).pack(pady=2)
+
+        # Auto crop: sparse keyframe samples + cropdetect
+        self.detections = {}
+        self.per_file_crop_var = tk.BooleanVar(value=False)
+        tk.Button(root, text="Auto-detect Crop", command=self.auto_detect_crop).pack(pady=2)
+        tk.Checkbutton(
+            root, text="Use per-file detected crop", variable=self.per_file_crop_var
+        ).pack(pady=2)
+        self.preview_label = tk.Label(root, text="")
+        self.preview_label.pack(pady=2)
+
+        tk.Button(root, text="Plan (dry run)", command=self.plan_batch).pack(pady=2)
         tk.Button(root, text="Start Cropping", command=self.start_cropping).pack(pady=10)
 
+        # Per-file status, progress and cancel
+        self.jobs = JobPanel(root)
+
     def select_directory(self):
         """Opens file dialog for directory selection."""
         directory = filedialog.askdirectory(title="Select Directory")
         if directory:
             self.input_dir_var.set(directory)
 
+    def list_videos(self):
+        """Video files in the selected input directory."""
+        input_dir = self.input_dir_var.get()
+        return [
+            os.path.join(input_dir, f)
+            for f in os.listdir(input_dir)
+            if f.lower().endswith(('.mp4', '.mkv', '.avi', '.mov'))
+        ]
+
+    def auto_detect_crop(self):
+        """Detect crops for every video on a background thread and propose parameters."""
+        if not self.input_dir_var.get():
+            messagebox.showerror("Error", "Please select a directory first.")
+            return
+        video_files = self.list_videos()
+        if not video_files:
+            messagebox.showerror("Error", "No valid video files found in directory.")
+            return
+
+        self.preview_label.config(text=f"Detecting crop on {len(video_files)} videos...", image="")
+
+        def detect():
+            detections = detect_crops(video_files)
+            result = {"detections": detections, "batch": batch_crop(detections)}
+            first = next(((p, d) for p, d in detections.items() if d), None)
+            if first:
+                crop = result["batch"] or first[1]["crop"]
+                result["preview"] = preview_thumbnail(first[0], crop, first[1]["seek"])
+            return result
+
+        run_in_background(self.root, detect, self.show_detected_crop)
+
+    def show_detected_crop(self, result):
+        """Fill in the proposed crop and preview once detection has finished."""
+        if isinstance(result, Exception):
+            self.preview_label.config(image="", text=f"Crop detection failed: {result}")
+            return
+
+        self.detections = result["detections"]
+        found = [d["crop"] for d in self.detections.values() if d]
+        if not found:
+            self.preview_label.config(text="No crop could be detected.")
+            return
+
+        crop = result["batch"] or found[0]
+        self.per_file_crop_var.set(result["batch"] is None)
+        for var, value in zip(
+            (self.crop_width_var, self.crop_height_var, self.x_offset_var, self.y_offset_var), crop
+        ):
+            var.set(value)
+
+        scope = "batch-wide" if result["batch"] else "per file (frame sizes differ)"
+        if result.get("preview"):
+            self.preview_image = tk.PhotoImage(file=result["preview"])
+            self.preview_label.config(image=self.preview_image, text=f"Detected crop {scope}", compound="top")
+        else:
+            self.preview_label.config(text=f"Detected crop {scope}: {crop}")
+
+    def plan_batch(self):
+        """Dry run: predict wall time, CPU-hours and output size from past runs."""
+        if not self.input_dir_var.get():
+            messagebox.showerror("Error", "Please select a directory first.")
+            return
+        video_files = self.list_videos()
+        if not video_files:
+            messagebox.showerror("Error", "No valid video files found in directory.")
+            return
+
+        self.preview_label.config(image="", text=f"Planning {len(video_files)} videos...")
+
+        def show(summary):
+            if isinstance(summary, Exception):
+                self.preview_label.config(image="", text=f"Planning failed: {summary}")
+                return
+            self.preview_label.config(text="\n".join(format_plan(summary)))
+
+        run_in_background(self.root, lambda: plan("crop", video_files), show)
+
     def start_cropping(self):
-        """Start the video cropping process using multiprocessing."""
+        """Start the video cropping process in the background job runner."""
+        if self.jobs.running:
+            messagebox.showerror("Error", "A batch is already running.")
+            return
+
         input_dir = self.input_dir_var.get()
         if not input_dir:
             messagebox.showerror("Error", "Please select a directory first.")
             return
 
-        video_files = [
-            os.path.join(input_dir, f)
-            for f in os.listdir(input_dir)
-            if f.lower().endswith(('.mp4', '.mkv', '.avi', '.mov'))
-        ]
+        video_files = self.list_videos()
 
         if not video_files:
             messagebox.showerror("Error", "No valid video files found in directory.")
@@ -158,24 +422,64 @@ class VideoCropApp:
         output_dir = os.path.join(input_dir, "cropped_videos")
         os.makedirs(output_dir, exist_ok=True)
 
-        # Prepare arguments for worker
+        # Crop each distinct input once; identical copies reuse its output.
+        # Hashing reads every input, so it runs off the Tk thread.
+        self.jobs.prepare(
+            lambda: find_duplicates(video_files), lambda duplicates: self.run_batch(output_dir, duplicates)
+        )
+
+    def run_batch(self, output_dir, duplicates):
+        """Start the crop jobs for the distinct inputs of find_duplicates()."""
+        duplicate_outputs = [
+            (os.path.join(output_dir, os.path.basename(original)), os.path.join(output_dir, os.path.basename(copy)))
+            for original, copies in duplicates.items()
+            for copy in copies
+        ]
+        if duplicate_outputs:
+            print(f"[DEDUP] {len(duplicate_outputs)} duplicate inputs will reuse an existing crop.")
+
+        # Prepare one argument tuple per input
+        manual_crop = (
+            self.crop_width_var.get(),
+            self.crop_height_var.get(),
+            self.x_offset_var.get(),
+            self.y_offset_var.get()
+        )
+        use_detected = self.per_file_crop_var.get()
         args = [
-            (
-                video_file,
-                os.path.join(output_dir, os.path.basename(video_file)),
-                self.crop_width_var.get(),
-                self.crop_height_var.get(),
-                self.x_offset_var.get(),
-                self.y_offset_var.get()
+            (video_file, os.path.join(output_dir, os.path.basename(video_file)))
+            + tuple(
+                self.detections[video_file]["crop"]
+                if use_detected and self.detections.get(video_file) else manual_crop
             )
-            for video_file in video_files
+            for video_file in duplicates
         ]
 
-        # Multiprocessing Pool
-        with multiprocessing.Pool() as pool:
-            pool.map(worker, args)
+        batch_id = start_batch("crop")
+        profile_dir = start_profiling("crop")
+
+        def finished(counts):
+            copy_duplicate_outputs(duplicate_outputs)
+            finish_batch(batch_id, "crop")
+            finish_profiling(profile_dir)
+            messagebox.showinfo(
+                "Completed",
+                f"Cropping finished: {counts['done']} done, {counts['failed']} failed, "
+                f"{counts['cancelled']} cancelled.",
+            )
 
-        messagebox.showinfo("Completed", "Cropping completed successfully.")
+        labels = [os.path.basename(arg[0]) for arg in args]
+        if self.segment_var.get():
+            # One file at a time, each spread across all cores
+            self.jobs.run(
+                labels, [arg + (True,) for arg in args], crop_video_cached, workers=1, on_finished=finished
+            )
+        else:
+            # ffmpeg-bound: supervise the children from one event loop, no worker processes
+            self.jobs.run_thread(
+                labels, lambda post, cancelled: crop_batch(args, post=post, cancelled=cancelled),
+                on_finished=finished,
+            )
 
 
 if __name__ == "__main__":
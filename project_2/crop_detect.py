@@ -0,0 +1,162 @@
+import os
+import re
+import sys
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from media_probe import probe_video
+from ffmpeg_runner import run_ffmpeg
+
+PREVIEW_DIR = os.path.join(os.path.expanduser("~"), ".video_tools", "previews")
+CROP_PATTERN = re.compile(r"crop=(\d+):(\d+):(\d+):(\d+)")
+
+
+def sample_times(duration, samples):
+    """
+    Evenly spaced sample points, skipping the first and last 5% (intros, fades).
+    Args:
+        duration: Video duration in seconds
+        samples: Number of sample points
+    Returns:
+        List[float]: Seek positions in seconds
+    """
+    if duration <= 0:
+        return [0.0]
+    start, end = duration * 0.05, duration * 0.95
+    step = (end - start) / max(samples, 1)
+    return [start + step * (i + 0.5) for i in range(samples)]
+
+
+def detect_crop_at(video_path, seek, frames=5):
+    """
+    Run cropdetect on a few frames starting at the keyframe nearest to seek.
+    Input-side -ss with -noaccurate_seek jumps straight to a keyframe, so only
+    the sampled frames are decoded.
+    Args:
+        video_path: Input video file path
+        seek: Position in seconds
+        frames: Frames to analyse at that position
+    Returns:
+        Tuple[int, int, int, int]: (width, height, x, y) or None
+    """
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-noaccurate_seek",
+        "-ss", f"{seek:.3f}",
+        "-i", video_path,
+        "-frames:v", str(frames),
+        "-an",
+        "-vf", "cropdetect=limit=24:round=2:reset=0",
+        "-f", "null", "-",
+    ]
+    process = run_ffmpeg(cmd, input_path=video_path, operation="cropdetect")
+    matches = CROP_PATTERN.findall(process.stderr.decode("utf-8", "replace"))
+    if not matches:
+        return None
+    return tuple(int(v) for v in matches[-1])
+
+
+def union_crop(crops):
+    """
+    Smallest crop containing every sampled crop, so content visible in any sample is kept.
+    Args:
+        crops: Iterable of (width, height, x, y)
+    Returns:
+        Tuple[int, int, int, int]: (width, height, x, y) or None
+    """
+    crops = [c for c in crops if c]
+    if not crops:
+        return None
+    left = min(x for _, _, x, _ in crops)
+    top = min(y for _, _, _, y in crops)
+    right = max(x + w for w, _, x, _ in crops)
+    bottom = max(y + h for _, h, _, y in crops)
+    return right - left, bottom - top, left, top
+
+
+def _cache_path(video_path, suffix):
+    info = os.stat(video_path)
+    key = f"{os.path.abspath(video_path)}|{info.st_size}|{info.st_mtime_ns}|{suffix}"
+    return os.path.join(PREVIEW_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest()[:20] + suffix)
+
+
+def detect_crop(video_path, samples=6, workers=None):
+    """
+    Propose crop parameters for one video from a handful of sparse keyframe samples
+    analysed in parallel. Results are cached per file (path, size, mtime).
+    Returns:
+        dict: {"crop": (w, h, x, y), "seek": time of a representative sample} or None
+    """
+    cache_file = _cache_path(video_path, f"-{samples}.json")
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as file:
+            cached = json.load(file)
+        return {"crop": tuple(cached["crop"]), "seek": cached["seek"]}
+
+    info = probe_video(video_path)
+    if info is None:
+        return None
+    times = sample_times(info["duration"], samples)
+    with ThreadPoolExecutor(max_workers=workers or len(times)) as pool:
+        crops = list(pool.map(lambda t: detect_crop_at(video_path, t), times))
+    crop = union_crop(crops)
+    if crop is None:
+        return None
+
+    result = {"crop": crop, "seek": times[len(times) // 2]}
+    os.makedirs(PREVIEW_DIR, exist_ok=True)
+    with open(cache_file, "w", encoding="utf-8") as file:
+        json.dump(result, file)
+    return result
+
+
+def detect_crops(video_paths, samples=6, workers=4):
+    """
+    Detect crops for many files in parallel.
+    Returns:
+        dict: video path -> detect_crop() result (None when detection failed)
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(video_paths, pool.map(lambda p: detect_crop(p, samples), video_paths)))
+
+
+def batch_crop(detections):
+    """
+    One crop for the whole batch: the union of per-file crops when all files
+    share a frame size, otherwise None (use per-file crops instead).
+    """
+    found = {path: d["crop"] for path, d in detections.items() if d}
+    if not found:
+        return None
+    sizes = {(probe["width"], probe["height"]) for probe in map(probe_video, found) if probe}
+    if len(sizes) != 1:
+        return None
+    return union_crop(found.values())
+
+
+def preview_thumbnail(video_path, crop, seek, width=320):
+    """
+    Cropped preview frame as a PNG, cached per file and crop.
+    Returns:
+        str: PNG path, or None if ffmpeg failed
+    """
+    w, h, x, y = crop
+    thumb = _cache_path(video_path, f"-{w}x{h}+{x}+{y}.png")
+    if os.path.exists(thumb):
+        return thumb
+    os.makedirs(PREVIEW_DIR, exist_ok=True)
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-noaccurate_seek",
+        "-ss", f"{seek:.3f}",
+        "-i", video_path,
+        "-frames:v", "1",
+        "-vf", f"crop={w}:{h}:{x}:{y},scale={width}:-2",
+        thumb,
+    ]
+    process = run_ffmpeg(cmd, input_path=video_path, output_path=thumb, operation="preview")
+    return thumb if process.returncode == 0 and os.path.exists(thumb) else None
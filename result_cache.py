@@ -0,0 +1,208 @@
+import os
+import json
+import stat
+import time
+import sqlite3
+import hashlib
+import functools
+
+from dedup import full_hash
+from fast_paths import clone_file
+from ffmpeg_runner import run_ffmpeg
+
+CACHE_DIR = os.environ.get(
+    "VIDEO_TOOLS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".video_tools", "cache")
+)
+CACHE_MAX_BYTES = int(os.environ.get("VIDEO_TOOLS_CACHE_MAX_BYTES", 50 * 1024 ** 3))
+CACHE_DISABLED = os.environ.get("VIDEO_TOOLS_CACHE", "1") == "0"
+CACHE_SCHEMA = 1  # Bump to invalidate every entry when operation semantics change
+
+# ffmpeg arguments of the metadata strip, as part of its result cache key
+STRIP_METADATA_PARAMS = {"map": "0", "map_metadata": "-1", "c": "copy"}
+
+
+def _connect():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(CACHE_DIR, "index.sqlite"), timeout=60)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        "key TEXT PRIMARY KEY, operation TEXT, path TEXT, size INTEGER, created REAL, last_access REAL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS fingerprints ("
+        "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)"
+    )
+    return conn
+
+
+def content_fingerprint(path):
+    """
+    Full content hash of a file, memoized by (path, size, mtime) so unchanged
+    inputs are only read once across runs.
+    """
+    path = os.path.abspath(path)
+    info = os.stat(path)
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT digest FROM fingerprints WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, info.st_size, info.st_mtime_ns),
+        ).fetchone()
+    if row:
+        return row[0]
+    digest = full_hash(path)
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)",
+            (path, info.st_size, info.st_mtime_ns, digest),
+        )
+    return digest
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version(program="ffmpeg"):
+    """First line of `<program> -version`, or "unknown"."""
+    try:
+        result = run_ffmpeg([program, "-version"], operation="version", check=True)
+        return result.stdout.decode("utf-8", "replace").splitlines()[0].strip()
+    except Exception:
+        return "unknown"
+
+
+def cache_key(operation, input_path, output_path, params, version):
+    """Key = hash of input content, operation, normalized params, output container and tool version."""
+    payload = json.dumps(
+        {
+            "schema": CACHE_SCHEMA,
+            "input": content_fingerprint(input_path),
+            "operation": operation,
+            "params": params,
+            "container": os.path.splitext(output_path)[1].lower(),
+            "version": version,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _lookup(key):
+    with _connect() as conn:
+        row = conn.execute("SELECT path, size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        path, size = row
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+    return path
+
+
+def _forget(key):
+    with _connect() as conn:
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+
+def _store(key, operation, output_path):
+    object_dir = os.path.join(CACHE_DIR, "objects", key[:2])
+    os.makedirs(object_dir, exist_ok=True)
+    path = os.path.join(object_dir, key + os.path.splitext(output_path)[1].lower())
+    temp_path = path + f".{os.getpid()}.tmp"
+    # Never hardlink into the store: a later in-place write to the output must not alter it
+    clone_file(output_path, temp_path, allow_hardlink=False)
+    os.chmod(temp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    os.replace(temp_path, path)
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (key, operation, path, os.path.getsize(path), now, now),
+        )
+    evict()
+
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the store fits in max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _connect() as conn:
+        rows = conn.execute("SELECT key, path, size FROM entries ORDER BY last_access").fetchall()
+        total = sum(size for _, _, size in rows)
+        for key, path, size in rows:
+            if total <= max_bytes:
+                break
+            if os.path.exists(path):
+                os.chmod(path, stat.S_IWUSR | stat.S_IRUSR)
+                os.remove(path)
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+
+def serve_cached(operation, input_path, output_path, params, version=None):
+    """
+    First half of cached_run for callers that run the job themselves (e.g. the
+    asyncio supervisor): place a cached result at output_path if there is one.
+    Returns:
+        Tuple[bool, str]: (served, key); pass key to remember() after a successful run.
+        key is None when the cache is disabled or unavailable.
+    """
+    key, hit = None, None
+    if not CACHE_DISABLED:
+        try:
+            key = cache_key(operation, input_path, output_path, params, version or tool_version())
+            hit = _lookup(key)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[CACHE] Unavailable for {input_path}: {e}")
+            key = None
+
+    if hit:
+        try:
+            # Never hardlink a hit: the output must not share an inode with the read-only store object
+            method = clone_file(hit, output_path, allow_hardlink=False)
+            os.chmod(output_path, os.stat(output_path).st_mode | stat.S_IWUSR)
+            print(f"[CACHE] Hit for {operation} of {os.path.basename(input_path)}; {method} into {output_path}")
+            return True, key
+        except OSError as e:
+            # A concurrent evict() removed the object between lookup and copy: treat it as a miss
+            print(f"[CACHE] Stale entry for {input_path}: {e}")
+            try:
+                _forget(key)
+            except sqlite3.Error:
+                pass
+
+    # Start the job from a fresh file, never writing through an old output (or a link to one)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    return False, key
+
+
+def remember(key, operation, output_path):
+    """Second half of cached_run: store a freshly produced output under key."""
+    if key is None or not os.path.exists(output_path):
+        return
+    try:
+        _store(key, operation, output_path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"[CACHE] Could not store {output_path}: {e}")
+
+
+def cached_run(operation, input_path, output_path, params, produce, version=None, succeeded=bool):
+    """
+    Serve output_path from the result cache or run produce() and cache its output.
+
+    Args:
+        operation: Operation name, e.g. "crop"
+        input_path: Input file whose content is part of the key
+        output_path: File the operation writes
+        params: JSON-serializable dict of normalized parameters
+        produce: Zero-argument callable that writes output_path
+        version: Tool version string, defaults to the ffmpeg version
+        succeeded: Predicate on produce()'s result deciding whether to cache it
+    Returns:
+        True on a cache hit, otherwise whatever produce() returned
+    """
+    served, key = serve_cached(operation, input_path, output_path, params, version)
+    if served:
+        return True
+    result = produce()
+    if succeeded(result):
+        remember(key, operation, output_path)
+    return result
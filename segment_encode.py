@@ -0,0 +1,157 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import multiprocessing
+
+from media_probe import probe_video, probe_keyframes
+from ffmpeg_runner import run_ffmpeg
+from worker_profiling import profiled
+
+
+def choose_split_points(keyframes, duration, segments):
+    """
+    Pick keyframe timestamps that divide a video into roughly equal time ranges.
+    Args:
+        keyframes: Sorted keyframe times in seconds
+        duration: Total video duration in seconds
+        segments: Requested number of segments
+    Returns:
+        List[float]: Split times (excluding 0), at most segments - 1 of them
+    """
+    candidates = [t for t in keyframes if 0 < t < duration]
+    points = []
+    for i in range(1, segments):
+        if not candidates:
+            break
+        target = duration * i / segments
+        nearest = min(candidates, key=lambda t: abs(t - target))
+        if not points or nearest > points[-1]:
+            points.append(nearest)
+    return points
+
+
+def split_at_keyframes(input_path, split_points, work_dir):
+    """
+    Split a video into stream-copied pieces at the given keyframe times.
+    Args:
+        input_path: Input video file path
+        split_points: Keyframe times to cut at
+        work_dir: Directory to write the pieces into
+    Returns:
+        List[str]: Paths of the pieces in playback order
+    """
+    ext = os.path.splitext(input_path)[1]
+    pattern = os.path.join(work_dir, f"part_%04d{ext}")
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i", input_path,
+        "-map", "0:v:0",
+        "-map", "0:a:0?",
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_times", ",".join(f"{t:.6f}" for t in split_points),
+        "-reset_timestamps", "1",
+        pattern,
+    ]
+    run_ffmpeg(cmd, input_path=input_path, operation="split", check=True)
+    return sorted(
+        os.path.join(work_dir, f) for f in os.listdir(work_dir) if f.startswith("part_")
+    )
+
+
+def concat_segments(segment_paths, output_path):
+    """
+    Join encoded pieces losslessly with the ffmpeg concat demuxer.
+    Args:
+        segment_paths: Encoded pieces in playback order
+        output_path: Final output file path
+    """
+    list_path = output_path + ".concat.txt"
+    with open(list_path, "w", encoding="utf-8") as file:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            file.write(f"file '{escaped}'\n")
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_path,
+        "-c", "copy",
+        output_path,
+    ]
+    try:
+        run_ffmpeg(cmd, output_path=output_path, operation="concat", check=True)
+    finally:
+        os.remove(list_path)
+
+
+@profiled("segment")
+def _encode_segment(args):
+    """Pool worker: run the job on one piece."""
+    job, segment_in, segment_out, job_args = args
+    return bool(job(segment_in, segment_out, *job_args))
+
+
+def encode_in_segments(input_path, output_path, job, job_args=(), segments=None):
+    """
+    Run a per-file job on keyframe-aligned pieces of one video in parallel and
+    stitch the results back together.
+
+    The pieces keep the first audio stream, so the job must carry it through
+    (e.g. ffmpeg with -c:a copy). Each piece is encoded on its own, so the result
+    is not bit-identical to running the job once on the whole file.
+
+    Args:
+        input_path: Input video file path
+        output_path: Final output file path
+        job: Picklable callable job(segment_in, segment_out, *job_args) returning truthy on success
+        job_args: Extra positional arguments for the job
+        segments: Number of pieces, defaults to the CPU count
+    Returns:
+        bool: True if every piece and the final concat succeeded
+    """
+    segments = segments or os.cpu_count() or 1
+    info = probe_video(input_path)
+    if info is None:
+        print(f"Could not probe {input_path}. Skipping...")
+        return False
+
+    split_points = []
+    if segments > 1:
+        split_points = choose_split_points(probe_keyframes(input_path), info["duration"], segments)
+    if not split_points:
+        print(f"No usable split points for {input_path}. Running single pass.")
+        return bool(job(input_path, output_path, *job_args))
+
+    work_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        in_dir = os.path.join(work_dir, "in")
+        out_dir = os.path.join(work_dir, "out")
+        os.makedirs(in_dir)
+        os.makedirs(out_dir)
+
+        pieces = split_at_keyframes(input_path, split_points, in_dir)
+        print(f"Split {input_path} into {len(pieces)} segments at {split_points}")
+
+        args = [
+            (job, piece, os.path.join(out_dir, os.path.basename(piece)), tuple(job_args))
+            for piece in pieces
+        ]
+        with multiprocessing.Pool(min(len(pieces), segments)) as pool:
+            results = pool.map(_encode_segment, args)
+
+        if not all(results):
+            print(f"One or more segments failed for {input_path}")
+            return False
+
+        concat_segments([a[2] for a in args], output_path)
+        print(f"Joined {len(pieces)} segments into {output_path}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"FFmpeg failed while segmenting {input_path}: {e.stderr.decode('utf-8', 'replace')}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -1,16 +1,114 @@
 import os
+import gc
+import json
+import hashlib
 import subprocess
 from textwrap import wrap
 from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
 from moviepy.config import change_settings
+from media_probe import probe_video
+from fast_paths import is_up_to_date
+from memory_watch import PeakRSSSampler
+from dedup import find_duplicates
+from fast_paths import link_or_copy
+from ffmpeg_runner import run_ffmpeg, measure, start_batch, finish_batch
+from result_cache import cached_run, STRIP_METADATA_PARAMS
+from worker_profiling import profile_job, start_profiling, finish_profiling
+from pipeline import overlay_texts
 
 # Configure ImageMagick binary path
 change_settings({"IMAGEMAGICK_BINARY": r"C:/Program Files/ImageMagick/magick.exe"})
 
-def add_padding_and_text(
-    input_folder,
-    output_folder,
-    text_file,
+# Tuned buffer sizes used while rendering one video. These size moviepy's
+# buffers; they are not a hard cap on memory. moviepy's reader pipe holds about
+# one frame by default, five keeps ffmpeg decoding ahead; the audio sizes are
+# moviepy's defaults.
+DEFAULT_MEMORY_LIMITS = {
+    "frame_buffer_frames": 5,   # Frames buffered in the ffmpeg reader pipe
+    "audio_buffersize": 200000,  # Audio frames held by the audio reader
+    "audio_bufsize": 2000,       # Audio chunk size used while writing
+}
+
+
+def limit_frame_buffer(clip, frames):
+    """
+    Size the ffmpeg reader pipe buffer of a VideoFileClip in frames.
+
+    Args:
+        clip (VideoFileClip): Clip whose reader is restarted with the new buffer size.
+        frames (int): Number of decoded frames the pipe may hold.
+    """
+    reader = clip.reader
+    width, height = reader.size
+    reader.bufsize = width * height * reader.depth * frames
+    reader.initialize()
+
+def render_signature(text, padding, style):
+    """
+    Hash of everything that changes a padded render besides the input video.
+
+    Args:
+        text (str): Overlay text of the video.
+        padding (dict): Padding fractions.
+        style (dict): Heading and text fonts, sizes, colors, offsets and the heading text.
+
+    Returns:
+        str: Hex digest stored next to the output (see signature_path).
+    """
+    payload = json.dumps({"text": text, "padding": padding, "style": style}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def signature_path(output_path):
+    """Sidecar file holding the render signature of a padded output."""
+    return output_path + ".render"
+
+
+def padded_output_matches(input_path, output_path, text_file, padding, heading_font_size, signature):
+    """
+    Check whether an existing output already is the padded render of the input.
+
+    The output must be newer than the input video and the text file, carry the
+    same render signature, have the padded frame size and the same duration
+    (within half a second).
+
+    Returns:
+        bool: True if re-rendering can be skipped.
+    """
+    if not is_up_to_date(output_path, input_path, text_file):
+        return False
+    try:
+        with open(signature_path(output_path), "r", encoding="utf-8") as file:
+            if file.read().strip() != signature:
+                return False
+    except OSError:
+        return False
+    source = probe_video(input_path)
+    rendered = probe_video(output_path)
+    if not source or not rendered:
+        return False
+    width, height = source["width"], source["height"]
+    side_padding = int(width * padding['left'])
+    expected_width = width + 2 * side_padding
+    expected_height = (
+        height + int(height * padding['top']) + heading_font_size * 3 + int(height * padding['bottom'])
+    )
+    return (
+        (rendered["width"], rendered["height"]) == (expected_width, expected_height)
+        and abs(rendered["duration"] - source["duration"]) <= 0.5
+    )
+
+
+def write_signature(output_path, signature):
+    """Record the render signature of a finished output."""
+    with open(signature_path(output_path), "w", encoding="utf-8") as file:
+        file.write(signature + "\n")
+
+
+def pad_video(
+    input_path,
+    output_path,
+    text,
     padding,
     heading_font="Arial",
     heading_font_size=50,
@@ -21,39 +119,38 @@ def add_padding_and_text(
     text_color="black",
     text_position_offset=20,
     heading="Video Heading",
+    memory_limits=None,
 ):
     """
-    Add padding and overlay text at the top of videos with adjustable text properties.
+    Render one padded video with heading and overlay text (see add_padding_and_text).
 
     Args:
-        input_folder (str): Path to the folder containing input videos.
-        output_folder (str): Path to the folder for saving processed videos.
-        text_file (str): Path to the text file containing overlay text lines.
-        padding (dict): Padding for top, bottom, left, and right as fractions of video dimensions.
-        heading_font (str): Font family for the heading.
-        heading_font_size (int): Font size for the heading.
-        heading_color (str): Color for the heading text.
-        heading_position_offset (int): Vertical adjustment for the heading in pixels.
-        text_font (str): Font family for the wrapped text.
-        text_font_size (int): Font size for the wrapped text.
-        text_color (str): Color for the wrapped text.
-        text_position_offset (int): Vertical adjustment for the wrapped text in pixels.
-        heading (str): Static heading text to display above the video.
-    """
-    with open(text_file, "r", encoding="utf-8") as file:
-        text_lines = file.readlines()
+        input_path (str): Input video.
+        output_path (str): Path of the rendered video.
+        text (str): Overlay text for this video.
+        Other arguments as for add_padding_and_text.
 
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-
-    for index, filename in enumerate(os.listdir(input_folder)):
-        if filename.endswith((".mp4", ".avi", ".mkv", ".mov")):
-            input_path = os.path.join(input_folder, filename)
-            output_path = os.path.join(output_folder, f"{filename}")
-            print(f"\n[INFO] Processing video: {filename} ({index + 1}/{len(os.listdir(input_folder))})")
-
-            video = VideoFileClip(input_path)
+    Returns:
+        bool: True once the output is written.
+    """
+    limits = dict(DEFAULT_MEMORY_LIMITS, **(memory_limits or {}))
+    signature = render_signature(text, padding, {
+        "heading": heading, "heading_font": heading_font, "heading_font_size": heading_font_size,
+        "heading_color": heading_color, "heading_position_offset": heading_position_offset,
+        "text_font": text_font, "text_font_size": text_font_size, "text_color": text_color,
+        "text_position_offset": text_position_offset,
+    })
+    # A render that fails halfway must not keep the previous render's signature
+    if os.path.exists(signature_path(output_path)):
+        os.remove(signature_path(output_path))
+    video = heading_clip = text_clip = final_video = None
+    with PeakRSSSampler() as sampler, measure("pad-text", input_path, output_path, "libx264,aac") as record, \
+            profile_job("pad-text"):
+        try:
+            video = VideoFileClip(input_path, audio_buffersize=limits["audio_buffersize"])
+            limit_frame_buffer(video, limits["frame_buffer_frames"])
             width, height = video.size
+            record.update(media_s=video.duration, width=width, height=height)
             top_padding = int(height * padding['top'])
             bottom_padding = int(height * padding['bottom'])
             side_padding = int(width * padding['left'])
@@ -64,8 +161,6 @@ def add_padding_and_text(
             text_height = heading_font_size * 3  # Approximate height for heading and text
             padded_video = video.margin(top=top_padding + text_height, bottom=bottom_padding, left=side_padding, right=side_padding, color=(255, 255, 255))
 
-            # Get the text for this video
-            text = text_lines[index].strip() if index < len(text_lines) else "No Text Available"
             wrapped_text = "\n".join(wrap(text, width=50))  # Wrap text at word boundaries
             print(f"  [STEP 4] Selected text for overlay:\n{wrapped_text}")
 
@@ -89,10 +184,111 @@ def add_padding_and_text(
             final_video = CompositeVideoClip([padded_video, heading_clip, text_clip])
 
             print(f"  [STEP 6] Writing processed video to: {output_path}")
-            final_video.write_videofile(output_path, codec='libx264', audio_codec='aac')
+            final_video.write_videofile(
+                output_path, codec='libx264', audio_codec='aac', audio_bufsize=limits["audio_bufsize"]
+            )
+        finally:
+            # Release ffmpeg readers and frame buffers before the next file
+            for clip in (final_video, text_clip, heading_clip, video):
+                if clip is not None:
+                    clip.close()
+            gc.collect()
+
+    write_signature(output_path, signature)
+    print(f"  [MEMORY] Peak RSS incl. ffmpeg children: {sampler.peak_mb:.1f} MB")
+    print(f"[SUCCESS] Video processed and saved as: {output_path}")
+    return True
+
 
-            print(f"[SUCCESS] Video processed and saved as: {output_path}")
+def add_padding_and_text(
+    input_folder,
+    output_folder,
+    text_file,
+    padding,
+    heading_font="Arial",
+    heading_font_size=50,
+    heading_color="red",
+    heading_position_offset=0,
+    text_font="Arial",
+    text_font_size=40,
+    text_color="black",
+    text_position_offset=20,
+    heading="Video Heading",
+    memory_limits=None,
+):
+    """
+    Add padding and overlay text at the top of videos with adjustable text properties.
 
+    Args:
+        input_folder (str): Path to the folder containing input videos.
+        output_folder (str): Path to the folder for saving processed videos.
+        text_file (str): Path to the text file containing overlay text lines.
+        padding (dict): Padding for top, bottom, left, and right as fractions of video dimensions.
+        heading_font (str): Font family for the heading.
+        heading_font_size (int): Font size for the heading.
+        heading_color (str): Color for the heading text.
+        heading_position_offset (int): Vertical adjustment for the heading in pixels.
+        text_font (str): Font family for the wrapped text.
+        text_font_size (int): Font size for the wrapped text.
+        text_color (str): Color for the wrapped text.
+        text_position_offset (int): Vertical adjustment for the wrapped text in pixels.
+        heading (str): Static heading text to display above the video.
+        memory_limits (dict): Overrides for the DEFAULT_MEMORY_LIMITS buffer sizes (not a hard memory cap).
+
+    Every reader, text clip and composite is closed after its video is written,
+    so memory does not grow from one video to the next. Peak RSS of the process
+    and its ffmpeg children is reported per video.
+    """
+    limits = dict(DEFAULT_MEMORY_LIMITS, **(memory_limits or {}))
+    style = {
+        "heading": heading, "heading_font": heading_font, "heading_font_size": heading_font_size,
+        "heading_color": heading_color, "heading_position_offset": heading_position_offset,
+        "text_font": text_font, "text_font_size": text_font_size, "text_color": text_color,
+        "text_position_offset": text_position_offset,
+    }
+
+    texts = {
+        filename: text for filename, text in overlay_texts(input_folder, text_file).items()
+        if filename.endswith((".mp4", ".avi", ".mkv", ".mov"))
+    }
+
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    batch_id = start_batch("pad-text")
+    profile_dir = start_profiling("pad-text")
+    filenames = list(texts)
+
+    # Identical inputs with the same overlay text are rendered once and linked
+    duplicates = find_duplicates([os.path.join(input_folder, f) for f in filenames])
+    original_of = {copy: original for original, copies in duplicates.items() for copy in copies}
+    rendered = {}
+
+    for index, filename in enumerate(filenames):
+        input_path = os.path.join(input_folder, filename)
+        output_path = os.path.join(output_folder, f"{filename}")
+        print(f"\n[INFO] Processing video: {filename} ({index + 1}/{len(filenames)})")
+
+        # Get the text for this video
+        text = texts[filename]
+        render_key = (original_of.get(input_path, input_path), text)
+        signature = render_signature(text, padding, style)
+        if render_key in rendered:
+            method = link_or_copy(rendered[render_key], output_path)
+            write_signature(output_path, signature)
+            print(f"[DEDUP] Same content and text as {os.path.basename(render_key[0])}; {method} of its output")
+            continue
+
+        if padded_output_matches(input_path, output_path, text_file, padding, heading_font_size, signature):
+            print(f"[SKIP] Output already up to date: {output_path}")
+            rendered[render_key] = output_path
+            continue
+
+        pad_video(input_path, output_path, text, padding, memory_limits=limits, **style)
+        rendered[render_key] = output_path
+
+    finish_batch(batch_id, "pad-text")
+    finish_profiling(profile_dir)
     print("\n[COMPLETED] All videos have been processed!")
 
 
@@ -134,6 +330,7 @@ def remove_metadata_in_place(folder_path, extensions=None):
 
     video_files = [f for f in os.listdir(folder_path) if os.path.splitext(f)[1].lower() in extensions]
 
+    batch_id = start_batch("strip-metadata")
     for file_name in video_files:
         input_path = os.path.join(folder_path, file_name)
         temp_output_path = os.path.join(folder_path, f"temp_{file_name}")
@@ -147,36 +344,44 @@ def remove_metadata_in_place(folder_path, extensions=None):
             temp_output_path            # Temporary output file
         ]
 
-        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        cached_run(
+            "strip-metadata", input_path, temp_output_path, STRIP_METADATA_PARAMS,
+            lambda: run_ffmpeg(
+                command, input_path=input_path, output_path=temp_output_path,
+                operation="strip-metadata", check=True, stdout=subprocess.DEVNULL,
+            ),
+        )
         os.replace(temp_output_path, input_path)
         print(f"Metadata removed: '{file_name}'")
 
+    finish_batch(batch_id, "strip-metadata")
     print("Metadata removal completed!")
 
 
-# Combined Workflow
-folder_path = "C:/Users/sahil/Downloads/video tools/output set 1"
-text_file = "C:/Users/sahil/Downloads/video tools/text line/english.txt"
-
-# Step 1: Add padding and text to videos
-add_padding_and_text(
-    input_folder="C:/Users/sahil/Downloads/video tools/videos/input",
-    output_folder=folder_path,
-    text_file=text_file,
-    padding={'top': 0.1, 'bottom': 0.05, 'left': 0.05, 'right': 0.05},
-    heading_font="Comic-Sans-MS",
-    heading_font_size=30,
-    heading_color="blue",
-    heading_position_offset=-40,
-    text_font="Comic-Sans-MS",
-    text_font_size=20,
-    text_color="black",
-    text_position_offset=40,
-    heading="Did You Know?"
-)
-
-# Step 2: Rename the videos
-rename_videos_in_folder(folder_path)
-
-# Step 3: Remove metadata from the renamed videos
-remove_metadata_in_place(folder_path)
+if __name__ == "__main__":
+    # Combined Workflow
+    folder_path = "C:/Users/sahil/Downloads/video tools/output set 1"
+    text_file = "C:/Users/sahil/Downloads/video tools/text line/english.txt"
+
+    # Step 1: Add padding and text to videos
+    add_padding_and_text(
+        input_folder="C:/Users/sahil/Downloads/video tools/videos/input",
+        output_folder=folder_path,
+        text_file=text_file,
+        padding={'top': 0.1, 'bottom': 0.05, 'left': 0.05, 'right': 0.05},
+        heading_font="Comic-Sans-MS",
+        heading_font_size=30,
+        heading_color="blue",
+        heading_position_offset=-40,
+        text_font="Comic-Sans-MS",
+        text_font_size=20,
+        text_color="black",
+        text_position_offset=40,
+        heading="Did You Know?"
+    )
+
+    # Step 2: Rename the videos
+    rename_videos_in_folder(folder_path)
+
+    # Step 3: Remove metadata from the renamed videos
+    remove_metadata_in_place(folder_path)
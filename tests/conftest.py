@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in (ROOT, os.path.join(ROOT, "project_2"), os.path.join(ROOT, "videos")):
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
@@ -0,0 +1,42 @@
+import pytest
+
+from cost_model import work_units, fit, estimate
+
+
+def record(operation, wall_s, encoder="libx264", returncode=0, **extra):
+    return dict(operation=operation, encoder=encoder, wall_s=wall_s, returncode=returncode, **extra)
+
+
+def test_work_units_per_operation_kind():
+    assert work_units("strip-metadata", 1000) == 1000
+    assert work_units("extract-audio", 1000, media_s=30) == 30
+    assert work_units("crop", 1000, media_s=10, width=1000, height=1000) == pytest.approx(10.0)
+    assert work_units("crop", 1000, media_s=10) is None
+    assert work_units("crop", 1000) is None
+
+
+def test_fit_skips_failed_and_unmeasurable_runs():
+    model = fit([
+        record("crop", 4.0, media_s=2, width=1000, height=1000, cpu_user_s=6.0, output_bytes=100),
+        record("crop", 9.0, returncode=1, media_s=2, width=1000, height=1000),
+        record("crop", 9.0),
+    ])
+    entry = model[("crop", "libx264")]
+    assert entry["jobs"] == 1
+    assert entry["units"] == pytest.approx(2.0)
+    assert entry["cpu_s"] == pytest.approx(6.0)
+    assert model[("crop", None)] == entry
+
+
+def test_estimate_scales_with_units_and_falls_back_across_encoders():
+    model = fit([record("crop", 4.0, media_s=2, width=1000, height=1000, output_bytes=100)])
+    info = {"duration": 4, "width": 1000, "height": 1000}
+    prediction = estimate(model, "crop", "h264_nvenc", 0, info)
+    assert prediction["wall_s"] == pytest.approx(8.0)
+    assert prediction["output_bytes"] == pytest.approx(200)
+
+
+def test_estimate_without_history_or_probe():
+    assert estimate({}, "crop", None, 0, {"duration": 1, "width": 2, "height": 2}) is None
+    model = fit([record("crop", 4.0, media_s=2, width=1000, height=1000)])
+    assert estimate(model, "crop", None, 0, None) is None
@@ -0,0 +1,16 @@
+from crop_detect import union_crop
+
+
+def test_union_covers_every_sample():
+    crops = [(100, 50, 10, 20), (80, 70, 30, 5)]
+    # left 10, top 5, right 110, bottom 75
+    assert union_crop(crops) == (100, 70, 10, 5)
+
+
+def test_skips_missing_samples():
+    assert union_crop([None, (640, 360, 0, 60), None]) == (640, 360, 0, 60)
+
+
+def test_no_samples():
+    assert union_crop([None, None]) is None
+    assert union_crop([]) is None
@@ -0,0 +1,28 @@
+from dedup import find_duplicates
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_groups_identical_files_in_input_order(tmp_path):
+    a = write(tmp_path / "a.mp4", b"same content")
+    b = write(tmp_path / "b.mp4", b"different!!!")
+    c = write(tmp_path / "c.mp4", b"same content")
+    assert find_duplicates([a, b, c]) == {a: [c], b: []}
+
+
+def test_same_ends_different_middle_are_distinct(tmp_path):
+    block = 16
+    a = write(tmp_path / "a.mp4", b"x" * block + b"AAAA" + b"y" * block)
+    b = write(tmp_path / "b.mp4", b"x" * block + b"BBBB" + b"y" * block)
+    assert find_duplicates([a, b], block_size=block) == {a: [], b: []}
+
+
+def test_large_identical_files_need_a_full_hash(tmp_path):
+    block = 16
+    data = b"x" * block + b"middle" + b"y" * block
+    a = write(tmp_path / "a.mp4", data)
+    b = write(tmp_path / "b.mp4", data)
+    assert find_duplicates([b, a], block_size=block) == {b: [a]}
@@ -0,0 +1,23 @@
+from ffmpeg_runner import media_from_stderr
+
+BANNER = """Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'in.mp4':
+  Duration: 00:01:02.50, start: 0.000000, bitrate: 1205 kb/s
+  Stream #0:0(und): Video: h264 (High) (avc1 / 0x31637661), yuv420p(progressive), 1920x1080 [SAR 1:1 DAR 16:9], 1000 kb/s, 25 fps
+Output #0, mp4, to 'out.mp4':
+  Stream #0:0(und): Video: h264 (avc1 / 0x31637661), yuv420p(progressive), 640x360 [SAR 1:1 DAR 16:9], q=2-31, 25 fps
+"""
+
+
+def test_reads_input_duration_and_size():
+    assert media_from_stderr(BANNER) == {"media_s": 62.5, "width": 1920, "height": 1080}
+
+
+def test_line_by_line_keeps_first_match():
+    found = {}
+    for line in BANNER.splitlines():
+        media_from_stderr(line, found)
+    assert found == {"media_s": 62.5, "width": 1920, "height": 1080}
+
+
+def test_nothing_found():
+    assert media_from_stderr("frame=  100 fps=25 q=28.0 size=256kB") == {}
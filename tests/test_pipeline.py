@@ -0,0 +1,47 @@
+import pytest
+
+from pipeline import Pipeline
+
+INFO = {"width": 1920, "height": 1080, "duration": 10.0}
+
+
+def test_filters_in_step_order():
+    chain, size = Pipeline().crop(1280, 720, 10, 20).resize(640, -2).filters(1920, 1080)
+    assert chain == ["crop=1280:720:10:20", "scale=640:360"]
+    assert size == (640, 360)
+
+
+def test_crop_is_clamped_to_the_frame_and_noops_are_dropped():
+    chain, size = Pipeline().crop(4000, 4000, 0, 0).resize(1920, 1080).filters(1920, 1080)
+    assert chain == []
+    assert size == (1920, 1080)
+
+
+def test_crop_outside_the_frame():
+    with pytest.raises(ValueError):
+        Pipeline().crop(100, 100, 1920, 0).filters(1920, 1080)
+
+
+def test_pad_text_grows_the_frame():
+    pipeline = Pipeline().pad_text({"top": 0.1, "bottom": 0.05, "left": 0.05}, text="hello")
+    chain, size = pipeline.filters(1000, 500)
+    assert chain[0].startswith("pad=w=1100:h=725:x=50:y=200")
+    assert [f.split("=", 1)[0] for f in chain] == ["pad", "drawtext", "drawtext"]
+    assert size == (1100, 725)
+
+
+def test_command_single_encode():
+    cmd = Pipeline(codec="h264_nvenc").resize(640, 360).strip_metadata().command("in.mp4", "out.mp4", INFO)
+    assert cmd[:4] == ["ffmpeg", "-y", "-i", "in.mp4"]
+    assert cmd[cmd.index("-vf") + 1] == "scale=640:360"
+    assert cmd[cmd.index("-c:v") + 1] == "h264_nvenc"
+    assert cmd[-3:] == ["-map_metadata", "-1", "out.mp4"]
+
+
+def test_command_metadata_only_stream_copies():
+    cmd = Pipeline().strip_metadata().command("in.mp4", "out.mp4", INFO)
+    assert cmd == ["ffmpeg", "-y", "-i", "in.mp4", "-map", "0", "-c", "copy", "-map_metadata", "-1", "out.mp4"]
+
+
+def test_command_noop():
+    assert Pipeline().resize(1920, 1080).rename().command("in.mp4", "out.mp4", INFO) is None
@@ -0,0 +1,19 @@
+from segment_encode import choose_split_points
+
+
+def test_picks_keyframe_nearest_each_boundary():
+    keyframes = [0.0, 2.0, 4.0, 6.0, 8.0, 10.0]
+    assert choose_split_points(keyframes, 12.0, 3) == [4.0, 8.0]
+
+
+def test_ignores_keyframes_at_start_and_end():
+    assert choose_split_points([0.0, 12.0], 12.0, 4) == []
+
+
+def test_never_repeats_a_keyframe():
+    # Sparse keyframes: several boundaries share the same nearest keyframe
+    assert choose_split_points([0.0, 5.0], 12.0, 4) == [5.0]
+
+
+def test_single_segment_has_no_split():
+    assert choose_split_points([0.0, 2.0, 4.0], 6.0, 1) == []
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+import work_queue
+from work_queue import Coordinator
+
+
+class Clock:
+    """Stands in for the time module inside work_queue."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(work_queue, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    return Coordinator(str(tmp_path / "queue.sqlite"), lease_s=60.0, max_attempts=2)
+
+
+def submit(coordinator, count=1):
+    return coordinator.submit([{"operation": "resize", "args": [i]} for i in range(count)])
+
+
+def test_jobs_are_leased_oldest_first_and_once(coordinator, clock):
+    submit(coordinator, 2)
+    first, second = coordinator.lease("w1"), coordinator.lease("w2")
+    assert (first["args"], second["args"]) == ([0], [1])
+    assert coordinator.lease("w3") is None
+
+
+def test_expired_lease_is_queued_again(coordinator, clock):
+    submit(coordinator)
+    job = coordinator.lease("w1")
+    clock.now += 61
+    again = coordinator.lease("w2")
+    assert again["id"] == job["id"]
+    # The first worker lost the lease: its heartbeat and result are refused
+    assert not coordinator.heartbeat(job["id"], "w1")
+    assert not coordinator.complete(job["id"], "w1", True)
+    assert coordinator.complete(job["id"], "w2", True)
+    assert coordinator.status()["counts"] == {"done": 1}
+
+
+def test_heartbeat_extends_the_lease(coordinator, clock):
+    submit(coordinator)
+    job = coordinator.lease("w1")
+    clock.now += 50
+    assert coordinator.heartbeat(job["id"], "w1")
+    clock.now += 50
+    assert coordinator.lease("w2") is None
+
+
+def test_gives_up_after_max_attempts(coordinator, clock):
+    submit(coordinator)
+    for _ in range(2):
+        assert coordinator.lease("w1") is not None
+        clock.now += 61
+    assert coordinator.lease("w2") is None
+    status = coordinator.status()
+    assert status["counts"] == {"failed": 1}
+    assert status["drained"]
+
+
+def test_failed_job_is_retried_until_max_attempts(coordinator, clock):
+    submit(coordinator)
+    for _ in range(2):
+        job = coordinator.lease("w1")
+        assert coordinator.complete(job["id"], "w1", False, "boom")
+    assert coordinator.lease("w1") is None
+    assert coordinator.status()["counts"] == {"failed": 1}
@@ -1,13 +1,21 @@
 import os
+import sys
 import subprocess
 
-def remove_metadata(folder_path, output_folder):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ffmpeg_runner import run_ffmpeg, start_batch, finish_batch
+from result_cache import cached_run, STRIP_METADATA_PARAMS
+from ffmpeg_async import FFmpegSupervisor, supervise
+
+
+def remove_metadata(folder_path, output_folder, concurrency=None):
     """
     Removes metadata from all video files in a folder.
 
     Args:
     folder_path (str): Path to the folder containing videos.
     output_folder (str): Path to the folder where processed videos will be saved.
+    concurrency (int): Concurrent ffmpeg processes, defaults to the CPU count.
     """
     # Ensure input folder exists
     if not os.path.exists(folder_path):
@@ -26,29 +34,66 @@ def remove_metadata(folder_path, output_folder):
         print("No video files found in the folder.")
         return
 
-    # Process each video file
-    for file_name in video_files:
-        input_path = os.path.join(folder_path, file_name)
-        output_path = os.path.join(output_folder, file_name)
-
-        # Use FFmpeg to remove metadata
-        command = [
-            "ffmpeg", "-i", input_path,  # Input file
-            "-map", "0",                # Copy all streams (audio, video, etc.)
-            "-map_metadata", "-1",      # Remove metadata
-            "-c", "copy",               # Copy codec (no re-encoding)
-            output_path                 # Output file
-        ]
-
-        try:
-            subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            print(f"Metadata removed: '{file_name}'")
-        except subprocess.CalledProcessError as e:
-            print(f"Error processing '{file_name}': {e}")
+    # Strip every file as concurrent ffmpeg children of one event loop
+    batch_id = start_batch("strip-metadata")
+    pairs = [(os.path.join(folder_path, f), os.path.join(output_folder, f)) for f in video_files]
+    for input_path, ok in strip_batch(pairs, concurrency=concurrency):
+        if ok:
+            print(f"Metadata removed: '{os.path.basename(input_path)}'")
+        else:
+            print(f"Error processing '{os.path.basename(input_path)}'")
 
+    finish_batch(batch_id, "strip-metadata")
     print("Metadata removal completed!")
 
-# Example usage
-folder_path = "C:/Users/sahil/Downloads/video tools/videos/sana9_8_"  # Path to the folder with original videos
-output_folder = "C:/Users/sahil/Downloads/video tools/videos/sana"   # Path to save videos without metadata
-remove_metadata(folder_path, output_folder)
+
+def strip_command(input_path, output_path):
+    """FFmpeg command that copies all streams and drops the metadata."""
+    return [
+        "ffmpeg", "-y",              # Replace an outdated output
+        "-i", input_path,           # Input file
+        "-map", "0",                # Copy all streams (audio, video, etc.)
+        "-map_metadata", "-1",      # Remove metadata
+        "-c", "copy",               # Copy codec (no re-encoding)
+        output_path                 # Output file
+    ]
+
+
+def strip_file(input_path, output_path):
+    """Strip the metadata of one file (served from the result cache when possible). Returns success."""
+    command = strip_command(input_path, output_path)
+    return cached_run(
+        "strip-metadata", input_path, output_path, STRIP_METADATA_PARAMS,
+        lambda: run_ffmpeg(
+            command, input_path=input_path, output_path=output_path,
+            operation="strip-metadata", stdout=subprocess.DEVNULL,
+        ).returncode == 0,
+    )
+
+
+async def strip_batch_async(supervisor, pairs):
+    """
+    Strip metadata from (input, output) pairs, serving cache hits without running ffmpeg.
+    Returns:
+        list: (input_path, succeeded) per pair, in order
+    """
+    jobs = [
+        {
+            "index": index, "cmd": strip_command(input_path, output_path), "input": input_path,
+            "output": output_path, "operation": "strip-metadata", "cache": STRIP_METADATA_PARAMS,
+        }
+        for index, (input_path, output_path) in enumerate(pairs)
+    ]
+    return [(result["job"]["input"], result["status"] == "done") for result in await supervisor.run_all(jobs)]
+
+
+def strip_batch(pairs, concurrency=None, cancelled=None):
+    """Blocking wrapper around strip_batch_async with its own FFmpegSupervisor."""
+    supervisor = FFmpegSupervisor(concurrency=concurrency)
+    return supervise(lambda s: strip_batch_async(s, pairs), supervisor, cancelled)
+
+if __name__ == "__main__":
+    # Example usage
+    folder_path = "C:/Users/sahil/Downloads/video tools/videos/sana9_8_"  # Path to the folder with original videos
+    output_folder = "C:/Users/sahil/Downloads/video tools/videos/sana"   # Path to save videos without metadata
+    remove_metadata(folder_path, output_folder)
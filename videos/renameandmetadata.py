@@ -1,6 +1,11 @@
 import os
+import sys
 import subprocess
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ffmpeg_runner import run_ffmpeg, start_batch, finish_batch
+from result_cache import cached_run, STRIP_METADATA_PARAMS
+
 def rename_videos_in_folder(folder_path, new_name="Day ", extensions=None):
     """
     Rename all video files in the specified folder.
@@ -64,6 +69,7 @@ def remove_metadata_in_place(folder_path, extensions=None):
         return
 
     # Process each video file
+    batch_id = start_batch("strip-metadata")
     for file_name in video_files:
         input_path = os.path.join(folder_path, file_name)
         temp_output_path = os.path.join(folder_path, f"temp_{file_name}")
@@ -78,12 +84,19 @@ def remove_metadata_in_place(folder_path, extensions=None):
         ]
 
         try:
-            subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            cached_run(
+                "strip-metadata", input_path, temp_output_path, STRIP_METADATA_PARAMS,
+                lambda: run_ffmpeg(
+                    command, input_path=input_path, output_path=temp_output_path,
+                    operation="strip-metadata", check=True, stdout=subprocess.DEVNULL,
+                ),
+            )
             os.replace(temp_output_path, input_path)  # Replace the original file with the temp file
             print(f"Metadata removed: '{file_name}'")
         except subprocess.CalledProcessError as e:
             print(f"Error processing '{file_name}': {e}")
 
+    finish_batch(batch_id, "strip-metadata")
     print("Metadata removal completed!")
 
 
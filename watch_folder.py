@@ -0,0 +1,302 @@
+import os
+import sys
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ffmpeg_runner import start_batch, finish_batch
+from fast_paths import is_up_to_date
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm")
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+def _libc():
+    """libc with inotify support, or None (not Linux, or no inotify)."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") else None
+
+
+class InotifySource:
+    """Write, close-write and move events for the files of one directory (not recursive)."""
+
+    def __init__(self, folder):
+        libc = _libc()
+        if libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch failed for {folder}")
+
+    def read(self, timeout):
+        """
+        Wait up to timeout seconds for events. Returns [(mask, file name)]; an
+        IN_Q_OVERFLOW event (events were dropped) has an empty name.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if name or mask & IN_Q_OVERFLOW:
+                events.append((mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _stat(path):
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return info.st_size, info.st_mtime_ns
+
+
+class FolderWatcher:
+    """
+    Yields files landing in one folder once they are completely written.
+
+    On Linux this uses inotify: a file becomes a candidate on close-write or when it
+    is moved in, and the directory is only rescanned if the kernel's event queue
+    overflowed. Elsewhere (or with
+    force_polling) the listing is polled every poll_interval seconds. Either way a
+    candidate is only reported once its size and mtime have stayed the same for
+    settle seconds, which covers writers that close and reopen the file.
+    """
+
+    def __init__(self, folder, extensions=VIDEO_EXTENSIONS, settle=1.0, poll_interval=1.0, force_polling=False):
+        self.folder = folder
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.pending = {}  # name -> (stat, time the stat was taken)
+        self.source = None
+        if not force_polling:
+            try:
+                self.source = InotifySource(folder)
+            except OSError as e:
+                print(f"[WATCH] inotify unavailable ({e}); polling {folder} every {poll_interval}s")
+
+    def _wanted(self, name):
+        return not name.startswith(".") and name.lower().endswith(self.extensions)
+
+    def _candidate(self, name, now):
+        stat = _stat(os.path.join(self.folder, name))
+        if stat is not None:
+            self.pending[name] = (stat, now)
+
+    def _scan(self, known, now):
+        """Make every wanted file whose stat differs from known a candidate."""
+        for name in os.listdir(self.folder):
+            if not self._wanted(name) or name in self.pending:
+                continue
+            stat = _stat(os.path.join(self.folder, name))
+            if stat is not None and known.get(name) != stat:
+                self.pending[name] = (stat, now)
+
+    def _settled(self, now):
+        """Pending files whose size and mtime held still for settle seconds."""
+        ready = []
+        for name, (stat, since) in list(self.pending.items()):
+            if now - since < self.settle:
+                continue
+            current = _stat(os.path.join(self.folder, name))
+            if current is None:
+                del self.pending[name]
+            elif current != stat:
+                self.pending[name] = (current, now)
+            else:
+                del self.pending[name]
+                ready.append(os.path.join(self.folder, name))
+        return ready
+
+    def arrivals(self, stop=None, existing=True):
+        """
+        Generator of complete new files.
+        Args:
+            stop: Optional threading.Event that ends the generator
+            existing: Also report the files already in the folder at start
+        """
+        now = time.monotonic()
+        known = {}
+        for name in sorted(os.listdir(self.folder)):
+            if self._wanted(name):
+                if existing:
+                    self._candidate(name, now)
+                else:
+                    known[name] = _stat(os.path.join(self.folder, name))
+
+        try:
+            while stop is None or not stop.is_set():
+                timeout = min(self.poll_interval, self.settle / 2) if self.pending else self.poll_interval
+                if self.source is not None:
+                    events = self.source.read(timeout)
+                    now = time.monotonic()
+                    for mask, name in events:
+                        if mask & IN_Q_OVERFLOW:
+                            # The kernel dropped events: find what they were about from the listing
+                            print(f"[WATCH] inotify queue overflowed; rescanning {self.folder}")
+                            self._scan(known, now)
+                            continue
+                        if not self._wanted(name):
+                            continue
+                        if mask & (IN_DELETE | IN_MOVED_FROM):
+                            self.pending.pop(name, None)
+                        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) or name in self.pending:
+                            # A write to a candidate restarts its settle timer
+                            self._candidate(name, now)
+                else:
+                    time.sleep(timeout)
+                    now = time.monotonic()
+                    self._scan(known, now)
+                for path in self._settled(now):
+                    known[os.path.basename(path)] = _stat(path)
+                    yield path
+        finally:
+            if self.source is not None:
+                self.source.close()
+
+
+def watch(folder, handle, concurrency=2, stop=None, existing=True, **watcher_options):
+    """
+    Run handle(path) for each completely written file arriving in folder, at most
+    `concurrency` at a time. While all slots are busy the watcher is not read:
+    events wait in the kernel's inotify queue (or for the next poll) and only
+    arrivals already found are held in memory. If a burst overflows the kernel's
+    queue (fs.inotify.max_queued_events), the folder is rescanned so no arrival
+    is lost.
+    Args:
+        folder: Folder to watch
+        handle: Called as handle(path) on a worker thread; usually starts ffmpeg
+        concurrency: Concurrent handle() calls
+        stop: Optional threading.Event that stops watching
+        existing: Also handle files already in the folder at start
+        watcher_options: Passed to FolderWatcher (settle, poll_interval, ...)
+    """
+    watcher = FolderWatcher(folder, **watcher_options)
+    slots = threading.BoundedSemaphore(concurrency)
+
+    def run(path):
+        start = time.perf_counter()
+        try:
+            result = handle(path)
+            print(f"[WATCH] {os.path.basename(path)}: {result} ({time.perf_counter() - start:.1f}s)")
+        except Exception as e:
+            print(f"[WATCH] {os.path.basename(path)} failed: {e}")
+        finally:
+            slots.release()
+
+    mode = "inotify" if watcher.source is not None else "polling"
+    print(f"[WATCH] Watching {folder} ({mode}, {concurrency} at a time); Ctrl+C to stop")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for path in watcher.arrivals(stop, existing=existing):
+            slots.acquire()
+            pool.submit(run, path)
+
+
+def tool_handler(tool, output_dir, crop=None):
+    """
+    handle(path) for one of the tools' existing single-file operations.
+    Inputs whose output is already newer than them are skipped.
+    """
+    sys.path.insert(0, os.path.join(ROOT, "project_2"))
+    sys.path.insert(0, os.path.join(ROOT, "videos"))
+    os.makedirs(output_dir, exist_ok=True)
+
+    if tool == "extract-audio":
+        from audio_extract import extract_audio_with_gpu, audio_output_path
+        output_of = lambda path: audio_output_path(path, output_dir)
+        run = lambda path: extract_audio_with_gpu(path, output_dir)
+    elif tool == "crop":
+        from bg import crop_video_cached
+        from crop_detect import detect_crop
+
+        def run(path):
+            params = crop
+            if params is None:
+                detected = detect_crop(path)
+                if detected is None:
+                    return "no crop detected"
+                params = detected["crop"]
+            return crop_video_cached(path, output_of(path), *params)
+        output_of = lambda path: os.path.join(output_dir, os.path.basename(path))
+    elif tool == "strip-metadata":
+        from metadata import strip_file
+        output_of = lambda path: os.path.join(output_dir, os.path.basename(path))
+        run = lambda path: strip_file(path, output_of(path))
+    else:
+        raise ValueError(f"Unknown tool: {tool}")
+
+    def handle(path):
+        if is_up_to_date(output_of(path), path):
+            return "up to date"
+        return run(path)
+    return handle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process videos as they land in a folder.")
+    parser.add_argument("tool", choices=("crop", "extract-audio", "strip-metadata"))
+    parser.add_argument("folder", help="Folder to watch (not recursive)")
+    parser.add_argument("output", help="Folder for the outputs")
+    parser.add_argument("--crop", help="W:H:X:Y for the crop tool; detected per file when omitted")
+    parser.add_argument("--concurrency", type=int, default=2, help="Files processed at a time")
+    parser.add_argument("--settle", type=float, default=1.0, help="Seconds a file must stay unchanged")
+    parser.add_argument("--poll", action="store_true", help="Poll instead of using inotify")
+    parser.add_argument("--new-only", action="store_true", help="Ignore files already in the folder")
+    args = parser.parse_args(argv)
+
+    crop = tuple(int(v) for v in args.crop.split(":")) if args.crop else None
+    handle = tool_handler(args.tool, args.output, crop)
+    batch_id = start_batch(f"watch-{args.tool}")
+    try:
+        watch(
+            args.folder, handle, concurrency=args.concurrency, existing=not args.new_only,
+            settle=args.settle, force_polling=args.poll,
+        )
+    except KeyboardInterrupt:
+        print("[WATCH] Stopped.")
+    finally:
+        finish_batch(batch_id, f"watch-{args.tool}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
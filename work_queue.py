@@ -0,0 +1,468 @@
+import os
+import sys
+import json
+import hmac
+import time
+import socket
+import sqlite3
+import argparse
+import importlib
+import threading
+import socketserver
+import multiprocessing
+
+from ffmpeg_runner import BATCH_ENV, rusage_totals, new_batch_id
+from memory_watch import kill_tree
+from pipeline import overlay_texts
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+DEFAULT_PORT = 8765
+TOKEN_ENV = "VIDEO_TOOLS_QUEUE_TOKEN"
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+# Queue operation -> (module, function, success predicate on its return value)
+OPERATIONS = {
+    "crop": ("bg", "crop_video_cached", lambda result: result is True),
+    "resize": ("multi_pro", "resize_video_cached", lambda result: not str(result).startswith("Failed")),
+    "extract-audio": ("audio_extract", "extract_audio_with_gpu", lambda result: result is True),
+    "pad-text": ("simple", "pad_video", lambda result: result is True),
+}
+
+
+class Coordinator:
+    """
+    Job table in SQLite with leases. A leased job must be heartbeated before its
+    lease runs out; otherwise (worker died, node lost) it is queued again, up to
+    max_attempts leases. Failed jobs are retried the same way.
+    """
+
+    def __init__(self, db_path, lease_s=60.0, max_attempts=3):
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=60)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY, batch TEXT, operation TEXT, args TEXT, kwargs TEXT, state TEXT, "
+            "worker TEXT, lease_expires REAL, attempts INTEGER DEFAULT 0, result TEXT, error TEXT, "
+            "created REAL, finished REAL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS metrics ("
+            "job_id INTEGER, worker TEXT, host TEXT, ok INTEGER, wall_s REAL, cpu_s REAL, max_rss_kb INTEGER, "
+            "reported REAL)"
+        )
+        self.conn.commit()
+
+    def submit(self, jobs, batch=None):
+        """Queue jobs ({"operation", "args", "kwargs"}). Returns the batch id."""
+        batch = batch or new_batch_id("queue")
+        now = time.time()
+        with self.lock, self.conn:
+            for job in jobs:
+                if job["operation"] not in OPERATIONS:
+                    raise ValueError(f"Unknown operation: {job['operation']}")
+                self.conn.execute(
+                    "INSERT INTO jobs (batch, operation, args, kwargs, state, created) VALUES (?, ?, ?, ?, 'queued', ?)",
+                    (batch, job["operation"], json.dumps(job.get("args", [])), json.dumps(job.get("kwargs", {})), now),
+                )
+        return batch
+
+    def _expire(self, now):
+        """Queue again (or give up on) jobs whose lease ran out."""
+        expired = self.conn.execute(
+            "SELECT id, worker, attempts FROM jobs WHERE state = 'leased' AND lease_expires < ?", (now,)
+        ).fetchall()
+        for job_id, worker, attempts in expired:
+            if attempts >= self.max_attempts:
+                self.conn.execute(
+                    "UPDATE jobs SET state = 'failed', worker = NULL, error = ?, finished = ? WHERE id = ?",
+                    (f"lease expired on {attempts} attempts", now, job_id),
+                )
+            else:
+                self.conn.execute("UPDATE jobs SET state = 'queued', worker = NULL WHERE id = ?", (job_id,))
+            print(f"[QUEUE] Lease of job {job_id} on {worker} expired")
+
+    def lease(self, worker):
+        """Hand the oldest queued job to worker. Returns the job dict or None."""
+        now = time.time()
+        with self.lock, self.conn:
+            self._expire(now)
+            row = self.conn.execute(
+                "SELECT id, batch, operation, args, kwargs FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker, now + self.lease_s, row[0]),
+            )
+        job_id, batch, operation, args, kwargs = row
+        return {
+            "id": job_id, "batch": batch, "operation": operation,
+            "args": json.loads(args), "kwargs": json.loads(kwargs), "lease_s": self.lease_s,
+        }
+
+    def heartbeat(self, job_id, worker):
+        """Extend a lease. False if the worker no longer holds it."""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND state = 'leased' AND worker = ?",
+                (time.time() + self.lease_s, job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker, ok, result=None, metrics=None):
+        """Record a job's outcome and the worker's metrics. False for a stale lease."""
+        now = time.time()
+        metrics = metrics or {}
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND state = 'leased' AND worker = ?", (job_id, worker)
+            ).fetchone()
+            if row is None:
+                return False
+            self.conn.execute(
+                "INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, worker, metrics.get("host"), int(ok), metrics.get("wall_s"), metrics.get("cpu_s"),
+                 metrics.get("max_rss_kb"), now),
+            )
+            if ok:
+                state = "done"
+            elif row[0] < self.max_attempts:
+                state = "queued"
+            else:
+                state = "failed"
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, result = ?, error = ?, finished = ? WHERE id = ?",
+                (state, json.dumps(result, default=str), None if ok else str(result), now, job_id),
+            )
+        return True
+
+    def status(self):
+        """Job counts per state and per-worker totals."""
+        with self.lock:
+            self._expire(time.time())
+            self.conn.commit()
+            counts = dict(self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            workers = self.conn.execute(
+                "SELECT worker, host, COUNT(*), SUM(ok), SUM(wall_s), SUM(cpu_s), MAX(max_rss_kb) "
+                "FROM metrics GROUP BY worker ORDER BY worker"
+            ).fetchall()
+        return {
+            "counts": counts,
+            "drained": not counts.get("queued") and not counts.get("leased"),
+            "workers": [
+                {"worker": w, "host": h, "jobs": n, "done": d or 0, "wall_s": wall or 0, "cpu_s": cpu or 0,
+                 "max_rss_kb": rss or 0}
+                for w, h, n, d, wall, cpu, rss in workers
+            ],
+        }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One JSON request per line, one JSON response per line."""
+
+    def handle(self):
+        coordinator, token = self.server.coordinator, self.server.token
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if token and not hmac.compare_digest(str(request.get("token", "")), token):
+                    raise PermissionError("bad token")
+                op = request.get("op")
+                if op == "submit":
+                    response = {"batch": coordinator.submit(request["jobs"], request.get("batch"))}
+                elif op == "lease":
+                    response = {"job": coordinator.lease(request["worker"])}
+                elif op == "heartbeat":
+                    response = {"ok": coordinator.heartbeat(request["job_id"], request["worker"])}
+                elif op == "complete":
+                    response = {"ok": coordinator.complete(
+                        request["job_id"], request["worker"], request["ok"],
+                        request.get("result"), request.get("metrics"),
+                    )}
+                elif op == "status":
+                    response = coordinator.status()
+                else:
+                    raise ValueError(f"unknown op {op!r}")
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, coordinator, host="127.0.0.1", port=DEFAULT_PORT, token=None):
+        super().__init__((host, port), _Handler)
+        self.coordinator = coordinator
+        self.token = token
+
+
+class QueueClient:
+    """Talks to a CoordinatorServer; one short connection per call, so coordinator restarts are harmless."""
+
+    def __init__(self, address, token=None, timeout=30):
+        self.address = address
+        self.token = token
+        self.timeout = timeout
+
+    def call(self, op, **fields):
+        request = dict(fields, op=op)
+        if self.token:
+            request["token"] = self.token
+        with socket.create_connection(self.address, timeout=self.timeout) as conn:
+            conn.sendall((json.dumps(request) + "\n").encode("utf-8"))
+            response = json.loads(conn.makefile("r", encoding="utf-8").readline())
+        if "error" in response:
+            raise RuntimeError(f"Coordinator error: {response['error']}")
+        return response
+
+    def call_retrying(self, op, delay=2.0, max_delay=30.0, **fields):
+        """call() that waits out an unreachable coordinator, doubling the delay up to max_delay."""
+        while True:
+            try:
+                return self.call(op, **fields)
+            except (OSError, ValueError) as e:  # ValueError: connection dropped mid-response
+                print(f"[QUEUE] Coordinator unreachable for {op} ({e}); retrying in {delay:g}s")
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
+
+
+def _job_function(operation):
+    for folder in ("project_2", "videos"):
+        path = os.path.join(ROOT, folder)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    module, name, succeeded = OPERATIONS[operation]
+    return getattr(importlib.import_module(module), name), succeeded
+
+
+def run_job(job):
+    """
+    Run one leased job in this process.
+    Returns:
+        Tuple[bool, object, dict]: (succeeded, result, metrics)
+    """
+    os.environ[BATCH_ENV] = job["batch"]  # Node-local metrics records carry the shared batch id
+    before = rusage_totals()
+    start = time.perf_counter()
+    try:
+        func, succeeded = _job_function(job["operation"])
+        result = func(*job["args"], **job["kwargs"])
+        ok = succeeded(result)
+    except Exception as e:
+        result, ok = f"{type(e).__name__}: {e}", False
+    finally:
+        os.environ.pop(BATCH_ENV, None)
+    metrics = {"host": socket.gethostname(), "wall_s": time.perf_counter() - start}
+    after = rusage_totals()
+    if before and after:
+        metrics.update(cpu_s=(after[0] - before[0]) + (after[1] - before[1]), max_rss_kb=after[2])
+    return ok, result, metrics
+
+
+def _job_process(job, conn):
+    """Child process entry: run one leased job and send (succeeded, result, metrics) back."""
+    ok, result, metrics = run_job(job)
+    conn.send((ok, result if isinstance(result, (bool, str, int, float)) else str(result), metrics))
+    conn.close()
+
+
+def run_worker(address, token=None, exit_when_drained=False, poll_s=2.0):
+    """
+    Pull jobs from the coordinator until stopped (or until the queue is drained).
+    Each job runs in its own process while a background thread heartbeats the
+    lease. If this worker dies the lease runs out and the job goes to another
+    worker; if the lease is lost anyway (e.g. a long network outage), the job's
+    process tree is killed so two workers never write the same output.
+    """
+    client = QueueClient(address, token)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    print(f"[QUEUE] Worker {worker} pulling from {address[0]}:{address[1]}")
+    while True:
+        job = client.call_retrying("lease", delay=poll_s, worker=worker)["job"]
+        if job is None:
+            if exit_when_drained and client.call_retrying("status", delay=poll_s)["drained"]:
+                return
+            time.sleep(poll_s)
+            continue
+
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_job_process, args=(job, sender))
+        start = time.perf_counter()
+        process.start()
+        sender.close()
+        stop, lost = threading.Event(), threading.Event()
+
+        def heartbeat():
+            while not stop.wait(job["lease_s"] / 3):
+                try:
+                    if not client.call("heartbeat", job_id=job["id"], worker=worker)["ok"]:
+                        print(f"[QUEUE] Lost the lease on job {job['id']}; stopping it")
+                        lost.set()
+                        kill_tree(process)
+                        return
+                except (OSError, ValueError) as e:
+                    print(f"[QUEUE] Heartbeat failed: {e}")
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        try:
+            outcome = receiver.recv()
+        except EOFError:  # Killed, or died before reporting
+            outcome = None
+        process.join()
+        stop.set()
+        beat.join()
+        receiver.close()
+        if lost.is_set():
+            continue  # The job is already queued again; its owner reports it
+        if outcome is None:
+            ok, result = False, f"Job process exited with code {process.exitcode}"
+            metrics = {"host": socket.gethostname(), "wall_s": time.perf_counter() - start}
+        else:
+            ok, result, metrics = outcome
+        print(f"[QUEUE] Job {job['id']} {job['operation']} {'done' if ok else 'failed'} in {metrics['wall_s']:.1f}s")
+        # Retried until delivered: the output exists, losing the report would rerun the job
+        client.call_retrying(
+            "complete", delay=poll_s, job_id=job["id"], worker=worker, ok=ok, result=result, metrics=metrics,
+        )
+
+
+def run_local(jobs, workers=2, db_path=":memory:", lease_s=60.0):
+    """
+    Run jobs through a coordinator on 127.0.0.1 and `workers` worker processes on
+    this machine, for testing the distributed mode on one box.
+    Returns:
+        dict: Coordinator status when the queue is drained
+    """
+    coordinator = Coordinator(db_path, lease_s=lease_s)
+    server = CoordinatorServer(coordinator, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    coordinator.submit(jobs)
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(server.server_address,), kwargs={"exit_when_drained": True, "poll_s": 0.5})
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    while not coordinator.status()["drained"]:
+        time.sleep(0.5)
+    for process in processes:
+        process.join()
+    server.shutdown()
+    return coordinator.status()
+
+
+def folder_jobs(operation, input_folder, output_folder, options):
+    """One job per video in input_folder, with the single-file function's arguments."""
+    inputs = sorted(
+        os.path.join(input_folder, f) for f in os.listdir(input_folder) if f.lower().endswith(VIDEO_EXTENSIONS)
+    )
+    jobs = []
+    texts = {}
+    if operation == "pad-text" and options.get("text_file"):
+        # Same text per video as simple.add_padding_and_text
+        texts = overlay_texts(input_folder, options["text_file"])
+    for path in inputs:
+        output_path = os.path.join(output_folder, os.path.basename(path))
+        if operation == "crop":
+            args = [path, output_path] + [int(v) for v in options["crop"].split(":")]
+        elif operation == "resize":
+            args = [path, output_folder] + [int(v) for v in options["size"].split("x")]
+        elif operation == "extract-audio":
+            args = [path, output_folder]
+        else:
+            text = texts.get(os.path.basename(path), "No Text Available")
+            top, bottom, side = (float(v) for v in options["padding"].split(","))
+            padding = {"top": top, "bottom": bottom, "left": side, "right": side}
+            args = [path, output_path, text, padding]
+            jobs.append({"operation": operation, "args": args, "kwargs": {"heading": options["heading"]}})
+            continue
+        jobs.append({"operation": operation, "args": args, "kwargs": {}})
+    return jobs
+
+
+def _address(value):
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Share one batch across several worker processes or nodes.")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV), help=f"Shared secret (or ${TOKEN_ENV})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run the coordinator")
+    serve.add_argument("--db", default="work_queue.sqlite")
+    serve.add_argument("--host", default="127.0.0.1", help="Use 0.0.0.0 to accept other nodes (requires --token)")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--lease", type=float, default=60.0, help="Lease seconds without a heartbeat")
+
+    worker = commands.add_parser("worker", help="Pull and run jobs")
+    worker.add_argument("--coordinator", default=f"127.0.0.1:{DEFAULT_PORT}")
+    worker.add_argument("--processes", type=int, default=1, help="Worker processes on this node")
+    worker.add_argument("--exit-when-drained", action="store_true")
+
+    for name in ("submit", "local"):
+        sub = commands.add_parser(name, help="Queue a folder" if name == "submit" else "Run a folder with local workers")
+        sub.add_argument("operation", choices=sorted(OPERATIONS))
+        sub.add_argument("input_folder")
+        sub.add_argument("output_folder")
+        sub.add_argument("--crop", help="W:H:X:Y for crop")
+        sub.add_argument("--size", default="640x480", help="WxH for resize")
+        sub.add_argument("--text-file", help="One overlay line per video for pad-text")
+        sub.add_argument("--heading", default="Video Heading")
+        sub.add_argument("--padding", default="0.1,0.05,0.05", help="top,bottom,side fractions for pad-text")
+        if name == "submit":
+            sub.add_argument("--coordinator", default=f"127.0.0.1:{DEFAULT_PORT}")
+        else:
+            sub.add_argument("--workers", type=int, default=2)
+
+    status = commands.add_parser("status", help="Show queue and worker totals")
+    status.add_argument("--coordinator", default=f"127.0.0.1:{DEFAULT_PORT}")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        if args.host not in LOOPBACK_HOSTS and not args.token:
+            parser.error(f"serving on {args.host} accepts jobs from the network; set --token or ${TOKEN_ENV}")
+        server = CoordinatorServer(Coordinator(args.db, lease_s=args.lease), args.host, args.port, args.token)
+        print(f"[QUEUE] Coordinator on {args.host}:{args.port} ({args.db})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("[QUEUE] Stopped.")
+        return 0
+    if args.command == "worker":
+        address = _address(args.coordinator)
+        processes = [
+            multiprocessing.Process(target=run_worker, args=(address, args.token, args.exit_when_drained))
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return 0
+    if args.command == "status":
+        print(json.dumps(QueueClient(_address(args.coordinator), args.token).call("status"), indent=2))
+        return 0
+
+    if args.operation == "crop" and not args.crop:
+        parser.error("crop needs --crop W:H:X:Y")
+    os.makedirs(args.output_folder, exist_ok=True)
+    jobs = folder_jobs(args.operation, args.input_folder, args.output_folder, vars(args))
+    if args.command == "submit":
+        batch = QueueClient(_address(args.coordinator), args.token).call("submit", jobs=jobs)["batch"]
+        print(f"[QUEUE] Submitted {len(jobs)} jobs as batch {batch}")
+    else:
+        print(json.dumps(run_local(jobs, workers=args.workers), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
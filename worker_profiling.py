@@ -0,0 +1,117 @@
+import os
+import glob
+import time
+import pstats
+import cProfile
+import functools
+import itertools
+import tracemalloc
+from contextlib import contextmanager
+
+# "cpu", "mem" or "cpu,mem"; inherited by pool and Process children through the environment
+PROFILE_ENV = "VIDEO_TOOLS_PROFILE"
+PROFILE_DIR_ENV = "VIDEO_TOOLS_PROFILE_DIR"
+PROFILE_ROOT = os.path.join(os.path.expanduser("~"), ".video_tools", "profiles")
+
+_job_counter = itertools.count()
+
+
+def _modes():
+    return {m.strip() for m in os.environ.get(PROFILE_ENV, "").split(",") if m.strip()}
+
+
+@contextmanager
+def profile_job(label):
+    """
+    Profile one job in the current process when profiling is switched on.
+    Writes <label>-<pid>-<n>.prof (cProfile) and/or .tracemalloc (snapshot) files.
+    """
+    modes = _modes()
+    out_dir = os.environ.get(PROFILE_DIR_ENV)
+    if not modes or not out_dir:
+        yield
+        return
+
+    stem = os.path.join(out_dir, f"{label}-{os.getpid()}-{next(_job_counter)}")
+    profiler = cProfile.Profile() if "cpu" in modes else None
+    started_tracing = "mem" in modes and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(25)
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(stem + ".prof")
+        if "mem" in modes and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            print(f"[PROFILE] {label}: peak Python allocations {peak / (1024 * 1024):.1f} MB")
+            tracemalloc.take_snapshot().dump(stem + ".tracemalloc")
+            if started_tracing:
+                tracemalloc.stop()
+
+
+def profiled(label):
+    """Decorator form of profile_job for module-level worker functions (stays picklable)."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_job(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_profiling(tool):
+    """
+    Prepare a per-batch stats folder if VIDEO_TOOLS_PROFILE is set.
+    Must be called in the parent before workers start so they inherit it.
+    Returns:
+        str: The stats folder, or None when profiling is off
+    """
+    if not _modes():
+        return None
+    out_dir = os.path.join(PROFILE_ROOT, f"{tool}-{time.strftime('%Y%m%d-%H%M%S')}")
+    os.makedirs(out_dir, exist_ok=True)
+    os.environ[PROFILE_DIR_ENV] = out_dir
+    print(f"[PROFILE] Writing per-worker stats to {out_dir}")
+    return out_dir
+
+
+def finish_profiling(out_dir, top=25):
+    """
+    Merge per-worker stats into merged.prof (pstats; loadable by snakeviz,
+    flameprof or gprof2dot) and merged_memory.txt, and print the hot spots.
+    """
+    os.environ.pop(PROFILE_DIR_ENV, None)
+    if not out_dir:
+        return
+
+    prof_files = sorted(glob.glob(os.path.join(out_dir, "*-*-*.prof")))
+    if prof_files:
+        stats = pstats.Stats(prof_files[0])
+        for path in prof_files[1:]:
+            stats.add(path)
+        merged = os.path.join(out_dir, "merged.prof")
+        stats.dump_stats(merged)
+        print(f"\n[PROFILE] Merged {len(prof_files)} worker profiles into {merged}")
+        stats.sort_stats("cumulative").print_stats(top)
+
+    snapshots = sorted(glob.glob(os.path.join(out_dir, "*.tracemalloc")))
+    if snapshots:
+        totals = {}
+        for path in snapshots:
+            for stat in tracemalloc.Snapshot.load(path).statistics("lineno"):
+                key = str(stat.traceback)
+                size, count = totals.get(key, (0, 0))
+                totals[key] = (size + stat.size, count + stat.count)
+        ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        report = os.path.join(out_dir, "merged_memory.txt")
+        with open(report, "w", encoding="utf-8") as file:
+            for where, (size, count) in ranked:
+                file.write(f"{size / 1024:10.1f} KiB {count:8d} blocks  {where}\n")
+        print(f"\n[PROFILE] Merged {len(snapshots)} allocation snapshots into {report}")
+        for where, (size, _) in ranked[:10]:
+            print(f"  {size / 1024:10.1f} KiB  {where}")